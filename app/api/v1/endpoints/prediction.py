@@ -1,9 +1,13 @@
-from fastapi import APIRouter
-from pydantic import BaseModel
-from typing import List, Optional
+from fastapi import APIRouter, HTTPException, Request, Response
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
+import asyncio
+import numpy as np
 
 # Import Service và Engine
 from app.services.earthquake_service import DisasterService
+from app.services.response_cache import EncodedPayload
+from app.services.training_jobs import training_jobs
 from app.upt_engine.formulas import UPTMath
 
 # [LEVEL 3 UPDATE] Thay đổi bộ não
@@ -33,6 +37,23 @@ class NeuralPredictionRequest(BaseModel):
     lon: float
     simulated_energy: float = 0.5
 
+MAX_BATCH_POINTS = 1_000_000
+MIN_GRID_RESOLUTION = 0.01 # độ
+
+# Batch forecast: danh sách điểm [[lat, lon], [lat, lon, energy]...] hoặc lưới lat/lon
+class GridSpec(BaseModel):
+    lat_min: float = -90.0
+    lat_max: float = 90.0
+    lon_min: float = -180.0
+    lon_max: float = 180.0
+    resolution: float = Field(1.0, ge=MIN_GRID_RESOLUTION)
+
+class BatchForecastRequest(BaseModel):
+    points: Optional[List[List[float]]] = None
+    grid: Optional[GridSpec] = None
+    simulated_energy: float = 0.5
+    format: Literal["json", "f32"] = "json"
+
 # --- API ENDPOINTS ---
 
 # 1. API CŨ: Dự báo công thức (Giữ nguyên cho tính tương thích)
@@ -63,14 +84,23 @@ async def predict_disaster(request: PredictionRequest):
     }
 
 # 2. API CŨ: Realtime USGS (Giữ nguyên)
+# Cache kết quả theo snapshot: chỉ tính lại upt_metrics + serialize khi STORE đổi
+_realtime_cache = {"store": None, "payload": None}
+
 @router.get("/realtime/usgs")
-async def get_realtime_prediction():
-    real_sensors = await DisasterService.fetch_all_realtime()
-    if not real_sensors:
+async def get_realtime_prediction(request: Request):
+    store = await DisasterService.refresh()
+    if not len(store):
         return {"message": "No data.", "upt_metrics": None, "raw_sensors": []}
 
-    avg_energy = sum(s['energy_level'] for s in real_sensors) / len(real_sensors)
-    avg_anomaly = sum(s['anomaly_score'] for s in real_sensors) / len(real_sensors)
+    if _realtime_cache["store"] is not store:
+        _realtime_cache["payload"] = _build_realtime_payload(store)
+        _realtime_cache["store"] = store
+    return _realtime_cache["payload"].response(request)
+
+def _build_realtime_payload(store):
+    avg_energy = store.mean('energy_level')
+    avg_anomaly = store.mean('anomaly_score')
     
     prob_index = UPTMath.calculate_collapse_probability(avg_anomaly, avg_energy, 0.5)
     resonance = avg_anomaly * avg_energy * 1.5 
@@ -80,27 +110,33 @@ async def get_realtime_prediction():
     if prob_index > 0.45: alert = "WARNING"
     if prob_index > 0.75: alert = "CRITICAL"
 
-    return {
+    return EncodedPayload.build(DisasterService.LIVE_VERSION, {
         "source": "USGS & NASA",
-        "detected_events": len(real_sensors),
+        "detected_events": len(store),
         "upt_metrics": {
             "probability_index": prob_index,
             "network_resonance": resonance,
             "stability_score": stability,
             "alert_level": alert
         },
-        "raw_sensors": real_sensors
-    }
+        "raw_sensors": store.to_records()
+    })
 
 # --- 3. CÁC API AI MỚI (NEURAL CORE) ---
 
 @router.get("/status")
 async def get_ai_status():
     """Kiểm tra trạng thái bộ não AI"""
+    # INITIALIZING: đang nạp checkpoint nền | FALLBACK: chưa có model, dùng công thức | ONLINE: LSTM
+    if not guardian_brain.is_ready: status = "INITIALIZING"
+    elif not guardian_brain.is_trained: status = "FALLBACK"
+    else: status = "ONLINE"
     return {
-        "status": "ONLINE" if guardian_brain.is_trained else "INITIALIZING",
-        "knowledge_base_size": len(guardian_brain.X_buffer),
-        "model_type": "RandomForestRegressor (Scikit-Learn)"
+        "status": status,
+        "ready": guardian_brain.is_ready,
+        "trained": guardian_brain.is_trained,
+        "knowledge_base_size": len(guardian_brain.realtime_buffer),
+        "model_type": "LSTM (NumPy inference)"
     }
 
 @router.post("/train")
@@ -117,6 +153,25 @@ async def trigger_training():
         "source_events": len(current_data)
     }
 
+@router.post("/train/jobs", status_code=202)
+async def submit_training_job(kind: Literal["deep"] = "deep"):
+    """
+    Huấn luyện lại LSTM (train tiếp từ checkpoint nếu có) trong process riêng.
+    Dự báo vẫn dùng model cũ cho tới khi job xong và model mới được swap vào.
+    """
+    return training_jobs.submit(kind)
+
+@router.get("/train/jobs")
+async def list_training_jobs():
+    return training_jobs.list()
+
+@router.get("/train/jobs/{job_id}")
+async def get_training_job(job_id: str):
+    job = training_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
 @router.post("/forecast")
 async def forecast_disaster(req: NeuralPredictionRequest):
     """Dự báo rủi ro tại tọa độ cụ thể bằng AI"""
@@ -132,4 +187,52 @@ async def forecast_disaster(req: NeuralPredictionRequest):
         "predicted_risk": risk,
         "alert_level": alert_level,
         "ai_confidence": 0.92 # Confidence giả lập
-    }
\ No newline at end of file
+    }
+
+@router.post("/forecast/batch")
+async def forecast_batch(req: BatchForecastRequest):
+    """
+    Dự báo rủi ro cho nhiều điểm trong 1 request (heatmap vùng dự báo).
+    format=f32: body là mảng float32 little-endian (theo thứ tự hàng của lưới / thứ tự điểm).
+    """
+    shape = None
+    if req.grid is not None:
+        g = req.grid
+        # Kẹp về miền tọa độ hợp lệ
+        lat_min, lat_max = max(g.lat_min, -90.0), min(g.lat_max, 90.0)
+        lon_min, lon_max = max(g.lon_min, -180.0), min(g.lon_max, 180.0)
+        if lat_min > lat_max or lon_min > lon_max:
+            raise HTTPException(status_code=400, detail="grid min must not exceed max")
+        # Tính kích thước lưới trước, chỉ cấp phát khi đã qua giới hạn số điểm
+        shape = (int(np.floor((lat_max - lat_min) / g.resolution + 1e-9)) + 1,
+                 int(np.floor((lon_max - lon_min) / g.resolution + 1e-9)) + 1)
+        if shape[0] * shape[1] > MAX_BATCH_POINTS:
+            raise HTTPException(status_code=400, detail="grid too large")
+        lat_axis = lat_min + np.arange(shape[0]) * g.resolution
+        lon_axis = lon_min + np.arange(shape[1]) * g.resolution
+        lat, lon = (a.ravel() for a in np.meshgrid(lat_axis, lon_axis, indexing="ij"))
+        energy = req.simulated_energy
+    elif req.points:
+        if len(req.points) > MAX_BATCH_POINTS:
+            raise HTTPException(status_code=400, detail="too many points")
+        if any(len(p) not in (2, 3) for p in req.points):
+            raise HTTPException(status_code=400, detail="each point must be [lat, lon] or [lat, lon, energy]")
+        pts = np.array([p if len(p) == 3 else [p[0], p[1], req.simulated_energy] for p in req.points],
+                       dtype=np.float64)
+        lat, lon, energy = pts[:, 0], pts[:, 1], pts[:, 2]
+    else:
+        raise HTTPException(status_code=400, detail="provide either points or grid")
+
+    # Anomaly mặc định 0.5 như /forecast. Chạy trong thread vì RandomForest trên lô lớn mất vài trăm ms
+    risk = await asyncio.to_thread(guardian_brain.predict_risk_batch, lat, lon, energy, 0.5)
+    risk = np.asarray(risk, dtype=np.float32)
+
+    if req.format == "f32":
+        headers = {"X-Risk-Count": str(len(risk))}
+        if shape: headers["X-Grid-Shape"] = f"{shape[0]},{shape[1]}"
+        return Response(content=risk.astype("<f4").tobytes(), media_type="application/octet-stream", headers=headers)
+
+    body = {"count": len(risk), "risk": risk.tolist()}
+    if shape:
+        body["grid"] = {"shape": list(shape), "lat": lat_axis.tolist(), "lon": lon_axis.tolist()}
+    return Response(content=EncodedPayload.dumps(body), media_type="application/json")
@@ -1,13 +1,41 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Query, WebSocket, WebSocketDisconnect
+from pydantic import BaseModel, Field
+from typing import List, Literal, Optional
 import asyncio
 import random
+import time
 
 # [QUAN TRỌNG] Import instance đang chạy từ core, KHÔNG tạo mới
 from app.upt_engine.reactor_core import upt_reactor
+from app.upt_engine.reactor_link import reactor_link
+from app.upt_engine.reactor_ensemble import ReactorEnsemble
+from app.upt_engine.reactor_forecast import fast_forward, trajectory_to_dict
+from app.upt_engine.telemetry_history import reactor_history
+from app.services.broadcast import BroadcastHub
+from app.services.response_cache import EncodedPayload
 
 router = APIRouter()
 
+# --- STATUS BROADCAST: 1 producer (tick vật lý) -> N màn hình điều khiển ---
+# maxsize nhỏ: client chậm chỉ nhận frame mới nhất, frame cũ bị bỏ
+status_hub = BroadcastHub(maxsize=2)
+_last_frame = {"frame": None}
+
+def _encode_status(reactor):
+    return EncodedPayload.dumps(reactor.get_status()).decode("utf-8")
+
+def _broadcast_status(reactor):
+    """Encode trạng thái đúng 1 lần mỗi tick rồi fan-out cùng 1 chuỗi cho mọi subscriber"""
+    if not len(status_hub):
+        _last_frame["frame"] = None
+        return
+    frame = _encode_status(reactor)
+    _last_frame["frame"] = frame
+    status_hub.publish(frame)
+
+upt_reactor.add_tick_listener(_broadcast_status)
+upt_reactor.add_tick_listener(reactor_history.record)
+
 class ReactorControlRequest(BaseModel):
     entropy_inject: float = 0.1
     enable_ai_safety: bool = True
@@ -18,22 +46,87 @@ async def simulate_reactor(control: ReactorControlRequest):
     API để client tác động thủ công vào lò phản ứng
     """
     try:
-        # Thay vì simulate_step, ta bơm entropy vào lò đang chạy
-        upt_reactor.update_external_stress(control.entropy_inject)
+        # Thay vì simulate_step, ta bơm entropy vào lò đang chạy (qua owner nếu chạy nhiều worker)
+        reactor_link.command("update_external_stress", control.entropy_inject)
         return upt_reactor.get_status()
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+class EnsembleRequest(BaseModel):
+    members: int = Field(2000, ge=1, le=20000)
+    ticks: int = Field(300, ge=1, le=3600)
+    magnitude: Optional[float] = None    # Động đất giả định (vd: 7.8)
+    flare_class: Optional[str] = None    # Lóa mặt trời giả định (vd: "X2.1")
+    seed: Optional[int] = None
+
+def _run_ensemble(req: EnsembleRequest):
+    ensemble = ReactorEnsemble(upt_reactor, req.members, seed=req.seed)
+    if req.flare_class: ensemble.apply_solar_flare(req.flare_class.upper())
+    if req.magnitude is not None: ensemble.apply_earthquake(req.magnitude)
+    return ensemble.run(req.ticks).summary()
+
+@router.post("/ensemble")
+async def run_ensemble(req: EnsembleRequest):
+    """
+    Monte Carlo: nhân bản trạng thái lò hiện tại thành N thành viên, áp kịch bản
+    (động đất / bão mặt trời) rồi chạy vật lý vector hóa -> phân phối kết cục
+    (xác suất CRITICAL / SCRAM, phân vị nhiệt độ, k_eff...)
+    """
+    # Chạy trong thread để không chặn vòng lặp tick của lò thật
+    result = await asyncio.to_thread(_run_ensemble, req)
+    result["scenario"] = {"magnitude": req.magnitude, "flare_class": req.flare_class, "seed": req.seed}
+    return result
+
+class ScheduledEvent(BaseModel):
+    tick: int = Field(..., ge=0)
+    type: Literal["shock", "cosmic"]  # shock = update_external_stress, cosmic = inject_cosmic_interference
+    value: float
+
+class ForecastRequest(BaseModel):
+    ticks: int = Field(3600, ge=1, le=100000)
+    seed: Optional[int] = None
+    events: List[ScheduledEvent] = []
+    max_points: int = Field(200, ge=2, le=5000)
+
+@router.post("/forecast")
+async def forecast_reactor(req: ForecastRequest):
+    """
+    Tua nhanh lò phản ứng K tick (1 tick = 1 giây thực) từ trạng thái hiện tại,
+    có thể kèm lịch sự kiện giả định. Có seed -> kết quả tái lập được.
+    """
+    # Chạy trong thread như /ensemble: 100k tick mất ~0.2s, không được chặn event loop
+    trajectory = await asyncio.to_thread(
+        fast_forward, upt_reactor, req.ticks, seed=req.seed,
+        events=[(e.tick, e.type, e.value) for e in req.events], max_points=req.max_points
+    )
+    result = trajectory_to_dict(trajectory)
+    result["final"] = {field: values[-1] for field, values in result.items()}
+    return result
+
+@router.get("/history")
+async def reactor_history_range(
+    seconds: Optional[float] = Query(None, gt=0, description="Cửa sổ tính từ hiện tại (mặc định 1 giờ)"),
+    start: Optional[float] = Query(None, description="Epoch giây"),
+    end: Optional[float] = Query(None, description="Epoch giây"),
+    buckets: int = Query(120, ge=1, le=5000),
+):
+    """
+    Lịch sử telemetry của lò: gom theo bucket min/max/mean cho mỗi chỉ số.
+    Dùng `seconds` (N giây gần nhất) hoặc cặp `start`/`end`.
+    """
+    end = end if end is not None else time.time()
+    if start is None:
+        start = end - (seconds or 3600)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start must be before end")
+    return reactor_history.query(start, end, buckets)
+
 @router.post("/scram")
 async def manual_scram():
     """
     Kích hoạt quy trình dập lò khẩn cấp (SCRAM)
     """
-    # Can thiệp trực tiếp vào các chỉ số lõi
-    upt_reactor.control_rods = 100.0  # Hạ hết thanh điều khiển
-    upt_reactor.neutron_flux = 0.0    # Cắt dòng neutron
-    upt_reactor.k_eff = 0.0           # Triệt tiêu phản ứng chuỗi
-    upt_reactor.core_temp = 300.0     # Reset nhiệt độ về mức thường
+    reactor_link.command("manual_scram")
     
     return {"status": "SCRAM_EXECUTED", "message": "Manual SCRAM initiated. Reactor Shutdown."}
 
@@ -41,22 +134,21 @@ async def manual_scram():
 @router.websocket("/ws/status")
 async def websocket_reactor_status(websocket: WebSocket):
     await websocket.accept()
+    sub = status_hub.subscribe()
     try:
+        # Gửi ngay trạng thái hiện tại, sau đó nhận frame từ tick vật lý (1 frame/tick)
+        await websocket.send_text(_last_frame["frame"] or _encode_status(upt_reactor))
         while True:
-            # Lấy trạng thái hiện tại từ lò phản ứng (đang chạy ngầm)
-            data = upt_reactor.get_status()
-            
-            # Gửi xuống client
-            await websocket.send_json(data)
-            
-            # Tốc độ làm mới: 2 FPS (0.5s)
-            await asyncio.sleep(0.5)
+            frame = await sub.get()
+            await websocket.send_text(frame)
             
     except WebSocketDisconnect:
         print("Client disconnected from Reactor Stream")
     except Exception as e:
         print(f"WS Error: {e}")
         await websocket.close()
+    finally:
+        status_hub.unsubscribe(sub)
 
 # --- INTERNAL HOOK FOR EARTHQUAKE SERVICE ---
 @router.post("/inject-event")
@@ -69,6 +161,6 @@ async def inject_real_event(magnitude: float):
     if magnitude > 7.5: shock = 1.0
     
     if shock > 0:
-        upt_reactor.update_external_stress(shock)
+        reactor_link.command("update_external_stress", shock)
         
     return {"status": "SHOCK_RECEIVED", "damage": shock}
\ No newline at end of file
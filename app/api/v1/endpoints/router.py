@@ -1,17 +1,100 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from typing import Optional
 from app.services.earthquake_service import DisasterService
+from app.services.event_stream import event_stream
+from app.upt_engine.deep_core import guardian_brain
+from app.upt_engine.reactor_link import reactor_link
 
 api_router = APIRouter()
 
+@api_router.get("/health")
+async def health_check():
+    """Health check: process sống + trạng thái khởi tạo của AI (ai_ready = đã nạp xong checkpoint nền)"""
+    return {
+        "status": "ok",
+        "ai_ready": guardian_brain.is_ready,
+        "ai_trained": guardian_brain.is_trained,
+        "worker_role": reactor_link.role,
+        "events_cached": len(DisasterService.get_store()),
+    }
+
 @api_router.get("/disasters/live")
-async def get_live_disasters():
+async def get_live_disasters(
+    request: Request,
+    min_lat: Optional[float] = Query(None, ge=-90, le=90),
+    max_lat: Optional[float] = Query(None, ge=-90, le=90),
+    min_lon: Optional[float] = Query(None, ge=-180, le=180),
+    max_lon: Optional[float] = Query(None, ge=-180, le=180),
+    lat: Optional[float] = Query(None, ge=-90, le=90),
+    lon: Optional[float] = Query(None, ge=-180, le=180),
+    radius_km: Optional[float] = Query(None, gt=0, le=20050),
+    k: Optional[int] = Query(None, ge=1, le=1000),
+):
     """
     API nội bộ: Trả về dữ liệu thiên tai đã được Server cache sẵn.
     Nhanh hơn gấp 10 lần so với gọi trực tiếp USGS/NASA.
+
+    Lọc theo vùng (dùng chỉ mục không gian, không quét toàn bộ):
+    - Bounding box: min_lat, max_lat, min_lon, max_lon (min_lon > max_lon = vắt qua kinh tuyến 180)
+    - Bán kính: lat, lon, radius_km (khoảng cách vòng lớn)
+    - K điểm gần nhất: lat, lon, k (có thể kết hợp với radius_km)
+
+    Không lọc: trả thẳng bytes JSON đã nén sẵn (gzip/br) kèm ETag, hỗ trợ 304.
     """
-    data = DisasterService.get_latest_data()
+    filters = (min_lat, max_lat, min_lon, max_lon, lat, lon, radius_km, k)
+    if all(v is None for v in filters):
+        return DisasterService.LIVE_PAYLOAD.response(request)
+
+    store = DisasterService.get_store()
+    data = store.to_records()
+
+    bbox = (min_lat, max_lat, min_lon, max_lon)
+    if any(v is not None for v in bbox):
+        if any(v is None for v in bbox):
+            raise HTTPException(status_code=400, detail="Bounding box requires min_lat, max_lat, min_lon, max_lon")
+        if min_lat > max_lat:
+            raise HTTPException(status_code=400, detail="min_lat must be <= max_lat")
+        idx = store.spatial_index().bbox(min_lat, max_lat, min_lon, max_lon)
+        data = [data[i] for i in idx.tolist()]
+
+    elif radius_km is not None or k is not None:
+        if lat is None or lon is None:
+            raise HTTPException(status_code=400, detail="Radius / nearest queries require lat and lon")
+        index = store.spatial_index()
+        if radius_km is not None:
+            idx, dist = index.radius(lat, lon, radius_km)
+            if k is not None: idx, dist = idx[:k], dist[:k]
+        else:
+            idx, dist = index.nearest(lat, lon, k)
+        data = [dict(data[i], distance_km=round(d, 2)) for i, d in zip(idx.tolist(), dist.tolist())]
+
     return {
         "source": "UPT_GUARDIAN_CACHE",
         "count": len(data),
         "data": data
-    }
\ No newline at end of file
+    }
+
+@api_router.websocket("/disasters/ws")
+async def websocket_disasters(websocket: WebSocket):
+    """
+    Luồng sự kiện realtime: gửi snapshot đầy đủ 1 lần, sau đó chỉ gửi delta
+    {"type": "delta", "version", "added", "updated", "removed"} mỗi khi dữ liệu đổi.
+    """
+    await websocket.accept()
+    # Đăng ký trước khi gửi snapshot để không lỡ delta nào (client bỏ qua delta có version <= snapshot)
+    sub = event_stream.hub.subscribe()
+    try:
+        await websocket.send_text(event_stream.snapshot_frame(DisasterService.LIVE_VERSION, DisasterService.get_store()))
+        while True:
+            frame = await sub.get()
+            if sub.overflowed:
+                # Client quá chậm, đã mất delta -> đồng bộ lại bằng snapshot mới nhất
+                sub.reset()
+                frame = event_stream.snapshot_frame(DisasterService.LIVE_VERSION, DisasterService.get_store())
+            await websocket.send_text(frame)
+    except WebSocketDisconnect:
+        print("Client disconnected from Disaster Stream")
+    except Exception as e:
+        print(f"WS Error: {e}")
+    finally:
+        event_stream.hub.unsubscribe(sub)
@@ -27,6 +27,7 @@ class Database:
             
             # Tạo index để tìm kiếm nhanh theo thời gian
             Database.db.raw_logs.create_index("timestamp")
+            Database.db.feature_store.create_index("timestamp")
             
         except ConnectionFailure as e:
             print(f"❌ [DATABASE] Connection Failed: {e}")
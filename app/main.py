@@ -3,13 +3,20 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse # [IMPORT MỚI]
 from fastapi.middleware.cors import CORSMiddleware
 import uvicorn
+import asyncio
 import os
 
 from app.api.v1.endpoints.router import api_router
 from app.api.v1.endpoints import reactor
 from app.api.v1.endpoints import prediction
-from app.upt_engine.reactor_core import upt_reactor
+from app.upt_engine.reactor_link import reactor_link
 from app.services.earthquake_service import DisasterService
+from app.upt_engine.deep_core import guardian_brain
+from app.services.snapshot_writer import snapshot_writer
+from app.services.alert_dispatcher import alert_dispatcher
+from app.services.ingest_scheduler import ingest_scheduler
+from app.services.training_jobs import training_jobs
+from app.services.worker_sync import worker_sync
 
 app = FastAPI(
     title="UPT Disaster AI - Guardian System",
@@ -38,11 +45,37 @@ app.include_router(api_router, prefix="/api/v1")
 app.include_router(reactor.router, prefix="/api/v1/reactor", tags=["Reactor"])
 app.include_router(prediction.router, prefix="/api/v1/predict", tags=["AI Prediction"])
 
+async def start_primary_services():
+    """
+    Dịch vụ nền chỉ chạy ở worker chính (lò local hoặc owner khi REACTOR_MODE=shared):
+    gọi upstream, cảnh báo Telegram, ghi DB, training. Follower tiếp quản cũng gọi hàm này.
+    """
+    await worker_sync.stop()
+    asyncio.create_task(guardian_brain.train_if_missing())
+    await DisasterService.fetch_all_realtime()
+    ingest_scheduler.start()
+
 @app.on_event("startup")
 async def startup_event():
     print(">>> SYSTEM BOOT SEQUENCE INITIATED <<<")
-    upt_reactor.start_reactor()
-    await DisasterService.fetch_all_realtime()
+    guardian_brain.start() # TF + checkpoint nạp nền, API phục vụ ngay bằng công thức fallback
+    if reactor_link.MODE == "shared":
+        worker_sync.configure(reactor_link.generation)
+    reactor_link.on_promote(start_primary_services)
+    await reactor_link.start()
+    if not reactor_link.is_primary:
+        worker_sync.start() # Follower: nhận dữ liệu ingest + checkpoint từ worker chính
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    print(">>> SYSTEM SHUTDOWN: Releasing upstream connections <<<")
+    await worker_sync.stop()
+    ingest_scheduler.shutdown()
+    await DisasterService.close()
+    await snapshot_writer.stop()
+    await alert_dispatcher.stop()
+    await reactor_link.stop()
+    training_jobs.shutdown()
 
 if __name__ == "__main__":
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
@@ -0,0 +1,183 @@
+import numpy as np
+
+from app.models.spatial_index import SpatialIndex
+
+
+class EventStore:
+    """
+    Kho sự kiện dạng cột (Columnar Event Store).
+    Mỗi trường số là 1 mảng NumPy liên tục, loại sự kiện mã hóa int8,
+    'place' được intern vào bảng chuỗi riêng (place_idx -> places),
+    'ids' giữ mã sự kiện gốc của nguồn (usgs:..., eonet:..., donki:...).
+    Các mảng là read-only nên có thể chia sẻ view mà không cần copy.
+    """
+
+    NUMERIC_FIELDS = ("lat", "lon", "energy_level", "anomaly_score", "raw_val")
+
+    # Bảng mã loại sự kiện (dùng chung toàn hệ thống, chỉ tăng thêm khi gặp loại mới)
+    TYPE_NAMES = ["EARTHQUAKE", "WILDFIRE", "VOLCANO", "STORM", "ICEBERG", "SOLAR_FLARE"]
+    _TYPE_CODES = {name: code for code, name in enumerate(TYPE_NAMES)}
+
+    def __init__(self, columns, type_code, place_idx, places, ids):
+        self.lat = columns["lat"]
+        self.lon = columns["lon"]
+        self.energy_level = columns["energy_level"]
+        self.anomaly_score = columns["anomaly_score"]
+        self.raw_val = columns["raw_val"]
+        self.type_code = type_code
+        self.place_idx = place_idx
+        self.places = places
+        self.ids = ids
+        self._records = None
+        self._spatial = None
+
+    # --- XÂY DỰNG ---
+    @classmethod
+    def type_code_of(cls, type_name):
+        code = cls._TYPE_CODES.get(type_name)
+        if code is None:
+            code = len(cls.TYPE_NAMES)
+            cls.TYPE_NAMES.append(type_name)
+            cls._TYPE_CODES[type_name] = code
+        return code
+
+    @classmethod
+    def empty(cls):
+        return cls.from_sensors([])
+
+    @classmethod
+    def from_sensors(cls, sensors):
+        """Đóng gói danh sách sensor dict thành các cột NumPy"""
+        n = len(sensors)
+        columns = {
+            f: np.fromiter((s.get(f, 0) or 0 for s in sensors), dtype=np.float64, count=n)
+            for f in cls.NUMERIC_FIELDS
+        }
+        type_code = np.fromiter((cls.type_code_of(s.get("type", "UNKNOWN")) for s in sensors),
+                                dtype=np.int8, count=n)
+
+        places, place_lookup = [], {}
+        def intern(place):
+            idx = place_lookup.get(place)
+            if idx is None:
+                idx = place_lookup[place] = len(places)
+                places.append(place)
+            return idx
+        place_idx = np.fromiter((intern(s.get("place") or "") for s in sensors), dtype=np.int32, count=n)
+
+        ids = np.empty(n, dtype=object)
+        ids[:] = [s.get("id") for s in sensors]
+
+        for arr in (*columns.values(), type_code, place_idx, ids):
+            arr.flags.writeable = False
+        return cls(columns, type_code, place_idx, places, ids)
+
+    def __len__(self):
+        return len(self.type_code)
+
+    # --- VIEW ---
+    def column(self, field):
+        """View read-only của 1 cột (không copy)"""
+        return getattr(self, field)
+
+    def select(self, index):
+        """
+        Lấy tập con theo slice (view, không copy) hoặc mask/chỉ số (copy các cột).
+        Bảng chuỗi 'places' được dùng chung.
+        """
+        columns = {f: getattr(self, f)[index] for f in self.NUMERIC_FIELDS}
+        return EventStore(columns, self.type_code[index], self.place_idx[index], self.places, self.ids[index])
+
+    def type_mask(self, type_name):
+        code = self._TYPE_CODES.get(type_name)
+        if code is None:
+            return np.zeros(len(self), dtype=bool)
+        return self.type_code == code
+
+    def spatial_index(self):
+        """Chỉ mục không gian lat/lon, dựng 1 lần cho mỗi snapshot"""
+        if self._spatial is None:
+            self._spatial = SpatialIndex(self.lat, self.lon)
+        return self._spatial
+
+    def diff(self, previous):
+        """
+        So sánh với snapshot trước theo mã sự kiện nguồn.
+        Trả về (added_idx, updated_idx, removed_ids): chỉ số trong snapshot này
+        của sự kiện mới / bị sửa (vd: USGS cập nhật magnitude), và mã các sự kiện đã biến mất.
+        """
+        prev_index = {event_id: i for i, event_id in enumerate(previous.ids.tolist())}
+        ids = self.ids.tolist()
+        old_idx = np.fromiter((prev_index.get(event_id, -1) for event_id in ids), dtype=np.int64, count=len(ids))
+
+        present = old_idx >= 0
+        added = np.flatnonzero(~present)
+        cur, old = np.flatnonzero(present), old_idx[present]
+
+        changed = self.type_code[cur] != previous.type_code[old]
+        for f in self.NUMERIC_FIELDS:
+            changed |= getattr(self, f)[cur] != getattr(previous, f)[old]
+        changed |= np.fromiter(
+            (self.places[a] != previous.places[b]
+             for a, b in zip(self.place_idx[cur].tolist(), previous.place_idx[old].tolist())),
+            dtype=bool, count=len(cur)
+        )
+
+        removed = list(prev_index.keys() - set(ids))
+        return added, cur[changed], removed
+
+    # --- AGGREGATES (VECTORIZED) ---
+    def mean(self, field):
+        if len(self) == 0: return 0.0
+        return float(getattr(self, field).mean())
+
+    def sum(self, field):
+        return float(getattr(self, field).sum())
+
+    def max(self, field, default=0.0):
+        if len(self) == 0: return default
+        return float(getattr(self, field).max())
+
+    def max_by_type(self, field):
+        """{type_name: max(field)} cho các loại sự kiện có mặt"""
+        if len(self) == 0: return {}
+        values = getattr(self, field)
+        out = np.full(len(self.TYPE_NAMES), -np.inf)
+        np.maximum.at(out, self.type_code, values)
+        return {self.TYPE_NAMES[code]: float(out[code]) for code in np.unique(self.type_code)}
+
+    def global_features(self):
+        """
+        Vector 5 chiều trạng thái toàn cầu cho LSTM:
+        [avg_energy, avg_anomaly, max_mag/10, event_count_norm, cosmic_energy]
+        """
+        if len(self) == 0: return [0.0, 0.0, 0.0, 0.0, 0.0]
+        # Normalize event count (Giả sử 200 event là mốc cao)
+        event_count_norm = min(len(self) / 200.0, 1.0)
+        # Lấy năng lượng vũ trụ (Solar Flare)
+        cosmic_energy = max(self.max_by_type("energy_level").get("SOLAR_FLARE", 0.0), 0.0)
+        return [
+            self.mean("energy_level"), self.mean("anomaly_score"),
+            self.max("raw_val") / 10.0, event_count_norm, cosmic_energy
+        ]
+
+    # --- XUẤT DỮ LIỆU ---
+    def to_records(self):
+        """Danh sách sensor dict (định dạng cũ) cho API JSON / MongoDB, được cache lại"""
+        if self._records is None:
+            types, places = self.TYPE_NAMES, self.places
+            self._records = [
+                {
+                    "id": event_id,
+                    "type": types[t], "place": places[p],
+                    "lat": lat, "lon": lon,
+                    "energy_level": e, "anomaly_score": a,
+                    "raw_val": r
+                }
+                for event_id, t, p, lat, lon, e, a, r in zip(
+                    self.ids.tolist(), self.type_code.tolist(), self.place_idx.tolist(),
+                    self.lat.tolist(), self.lon.tolist(),
+                    self.energy_level.tolist(), self.anomaly_score.tolist(), self.raw_val.tolist()
+                )
+            ]
+        return self._records
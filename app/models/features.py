@@ -0,0 +1,92 @@
+import numpy as np
+
+from app.models.spatial_index import EARTH_RADIUS_KM
+
+# Danh sách tọa độ Vành đai lửa (Kiến thức địa lý) - dùng chung cho ingest và GuardianAI
+FAULT_LINES = [
+    [36.2, 138.2], [37.7, -122.4], [-33.4, -70.6],
+    [-6.2, 106.8], [14.0, 121.0], [-41.2, 174.7],
+    [35.0, 25.0], [28.0, 84.0]
+]
+
+# Cột của 1 dòng đặc trưng trạm (thứ tự input của GuardianAI)
+SENSOR_ROW_FIELDS = ["lat", "lon", "energy_level", "anomaly_score", "fault_distance_km"]
+SENSOR_ROWS_PER_SNAPSHOT = 20
+
+
+def distance_to_fault(lat, lon, fault_lines=FAULT_LINES):
+    """Khoảng cách vòng lớn (haversine, km) từ N điểm tới đứt gãy gần nhất: ma trận N x M rồi lấy min"""
+    faults = np.radians(np.asarray(fault_lines, dtype=np.float64))
+    lat_r = np.radians(np.asarray(lat, dtype=np.float64))[:, None]
+    lon_r = np.radians(np.asarray(lon, dtype=np.float64))[:, None]
+    a = (np.sin((faults[:, 0] - lat_r) / 2) ** 2
+         + np.cos(lat_r) * np.cos(faults[:, 0]) * np.sin((faults[:, 1] - lon_r) / 2) ** 2)
+    d = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+    return d.min(axis=1)
+
+
+def sensor_rows(store):
+    """EventStore (mẫu) -> ma trận (n, 5) float32 theo SENSOR_ROW_FIELDS"""
+    if len(store) == 0:
+        return np.empty((0, len(SENSOR_ROW_FIELDS)), dtype=np.float32)
+    return np.column_stack([
+        store.lat, store.lon, store.energy_level, store.anomaly_score,
+        distance_to_fault(store.lat, store.lon)
+    ]).astype(np.float32)
+
+
+def sensor_rows_from_records(sensors):
+    """Danh sách dict sensor (định dạng raw_logs cũ) -> ma trận (n, 5) float32"""
+    base = [(s['lat'], s['lon'], s.get('energy_level', 0), s.get('anomaly_score', 0))
+            for s in sensors if 'lat' in s and 'lon' in s]
+    if not base:
+        return np.empty((0, len(SENSOR_ROW_FIELDS)), dtype=np.float32)
+    base = np.array(base, dtype=np.float64)
+    return np.column_stack([base, distance_to_fault(base[:, 0], base[:, 1])]).astype(np.float32)
+
+
+def feature_doc(timestamp, store, sample, features, **extra):
+    """
+    Document cho collection 'feature_store': vector toàn cầu 5 chiều + các dòng đặc trưng trạm
+    (mảng float32 nhị phân) - training chỉ đọc các trường này, không đọc lại raw_logs.
+    """
+    if features is None:
+        features = store.global_features()
+    rows = sensor_rows(sample)
+    doc = {
+        "timestamp": timestamp,
+        "max_magnitude": store.max("raw_val"),
+        "features": [float(x) for x in features],
+        "sensor_rows": rows.tobytes(),
+        "n_rows": len(rows),
+    }
+    doc.update(extra)
+    return doc
+
+
+def decode_sensor_rows(doc):
+    data = doc.get("sensor_rows")
+    if not data:
+        return np.empty((0, len(SENSOR_ROW_FIELDS)), dtype=np.float32)
+    return np.frombuffer(data, dtype=np.float32).reshape(-1, len(SENSOR_ROW_FIELDS))
+
+
+def merged_history(feature_col, legacy_col, query, direction, limit, feature_projection, legacy_projection):
+    """
+    Đọc lịch sử theo thời gian từ feature_store, bù bằng raw_logs cho các snapshot chưa có trong
+    feature_store (giai đoạn trước khi có feature_store, hoặc chưa backfill hết). Hai nguồn được
+    nối theo timestamp; snapshot có ở cả 2 collection (cùng timestamp) chỉ lấy từ feature_store.
+    Trả về [(is_feature_doc, doc)] theo thứ tự `direction` (1 tăng dần, -1 giảm dần), tối đa `limit`.
+    """
+    def fetch(col, projection):
+        if col is None or limit <= 0: return []
+        return list(col.find(query, projection).sort("timestamp", direction).limit(limit))
+
+    # `limit` bản ghi đầu của mỗi nguồn là đủ: kết quả gộp không lấy quá `limit` bản ghi từ 1 nguồn
+    newer = fetch(feature_col, feature_projection)
+    covered = {doc.get("timestamp") for doc in newer}
+    older = [doc for doc in fetch(legacy_col, legacy_projection) if doc.get("timestamp") not in covered]
+
+    merged = [(True, doc) for doc in newer] + [(False, doc) for doc in older]
+    merged.sort(key=lambda item: item[1]["timestamp"], reverse=direction == -1) # sort ổn định
+    return merged[:limit]
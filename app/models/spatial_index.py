@@ -0,0 +1,122 @@
+import numpy as np
+
+EARTH_RADIUS_KM = 6371.0
+
+
+class SpatialIndex:
+    """
+    Chỉ mục không gian dạng lưới lat/lon (Grid Index).
+    Sự kiện được sắp xếp theo ô lưới (CELL_DEG độ), offsets[c]..offsets[c+1]
+    là đoạn chỉ số thuộc ô c. Truy vấn chỉ duyệt các ô giao với vùng cần tìm,
+    sau đó lọc chính xác bằng khoảng cách vòng lớn (great-circle).
+    """
+
+    CELL_DEG = 5.0
+    N_ROWS = int(180 / CELL_DEG)
+    N_COLS = int(360 / CELL_DEG)
+
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+
+        cells = self._row(self.lat) * self.N_COLS + self._col(self.lon)
+        self.order = np.argsort(cells, kind="stable")
+        self.offsets = np.searchsorted(cells[self.order], np.arange(self.N_ROWS * self.N_COLS + 1))
+
+        # Vector đơn vị 3D để tính khoảng cách góc bằng tích vô hướng
+        lat_r, lon_r = np.radians(self.lat), np.radians(self.lon)
+        self.xyz = np.column_stack((np.cos(lat_r) * np.cos(lon_r), np.cos(lat_r) * np.sin(lon_r), np.sin(lat_r)))
+
+    def __len__(self):
+        return len(self.lat)
+
+    @classmethod
+    def _row(cls, lat):
+        return np.clip(np.floor((np.asarray(lat) + 90.0) / cls.CELL_DEG), 0, cls.N_ROWS - 1).astype(np.int64)
+
+    @classmethod
+    def _col(cls, lon):
+        return np.clip(np.floor((np.asarray(lon) + 180.0) / cls.CELL_DEG), 0, cls.N_COLS - 1).astype(np.int64)
+
+    @staticmethod
+    def _lon_range(min_lon, max_lon):
+        """Chuẩn hóa khoảng kinh độ về [-180, 180] (min > max nghĩa là vắt qua kinh tuyến 180)"""
+        if max_lon - min_lon >= 360.0: return -180.0, 180.0
+        wrap = lambda x: x if -180.0 <= x <= 180.0 else ((x + 180.0) % 360.0) - 180.0
+        return wrap(min_lon), wrap(max_lon)
+
+    def _candidates(self, min_lat, max_lat, min_lon, max_lon):
+        """Chỉ số các sự kiện nằm trong các ô lưới giao với bbox (chưa lọc chính xác)"""
+        r0, r1 = int(self._row(min_lat)), int(self._row(max_lat))
+        c0, c1 = int(self._col(min_lon)), int(self._col(max_lon))
+        if min_lon <= max_lon:
+            col_ranges = [(c0, c1)]
+        elif c1 < c0:
+            # bbox vắt qua kinh tuyến 180 -> tách làm 2 đoạn cột
+            col_ranges = [(c0, self.N_COLS - 1), (0, c1)]
+        else:
+            # Vắt qua nhưng 2 đầu cùng 1 ô (hoặc chồng nhau) -> 2 đoạn phủ mọi cột, quét cả hàng 1 lần
+            col_ranges = [(0, self.N_COLS - 1)]
+
+        chunks = []
+        for r in range(r0, r1 + 1):
+            base = r * self.N_COLS
+            for a, b in col_ranges:
+                chunks.append(self.order[self.offsets[base + a]:self.offsets[base + b + 1]])
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def _query_vector(self, lat, lon):
+        lat_r, lon_r = np.radians(lat), np.radians(lon)
+        return np.array([np.cos(lat_r) * np.cos(lon_r), np.cos(lat_r) * np.sin(lon_r), np.sin(lat_r)])
+
+    def _angular_distance(self, idx, lat, lon):
+        dots = self.xyz[idx] @ self._query_vector(lat, lon)
+        return np.arccos(np.clip(dots, -1.0, 1.0))
+
+    # --- TRUY VẤN ---
+    def bbox(self, min_lat, max_lat, min_lon, max_lon):
+        """Chỉ số sự kiện trong hộp bao (min_lon > max_lon nghĩa là vắt qua kinh tuyến 180)"""
+        if len(self) == 0: return np.empty(0, dtype=np.int64)
+        min_lon, max_lon = self._lon_range(min_lon, max_lon)
+        idx = self._candidates(min_lat, max_lat, min_lon, max_lon)
+
+        lat, lon = self.lat[idx], self.lon[idx]
+        mask = (lat >= min_lat) & (lat <= max_lat)
+        if min_lon <= max_lon:
+            mask &= (lon >= min_lon) & (lon <= max_lon)
+        else:
+            mask &= (lon >= min_lon) | (lon <= max_lon)
+        return np.sort(idx[mask])
+
+    def radius(self, lat, lon, radius_km):
+        """(chỉ số, khoảng cách km) các sự kiện trong bán kính, sắp xếp từ gần đến xa"""
+        if len(self) == 0: return np.empty(0, dtype=np.int64), np.empty(0)
+        ang = radius_km / EARTH_RADIUS_KM
+        dlat = np.degrees(ang)
+        min_lat, max_lat = max(lat - dlat, -90.0), min(lat + dlat, 90.0)
+
+        # Vòng tròn chứa cực hoặc quá rộng -> quét toàn bộ kinh độ
+        cos_lat = np.cos(np.radians(lat))
+        if min_lat <= -90.0 or max_lat >= 90.0 or np.sin(ang) >= cos_lat:
+            min_lon, max_lon = -180.0, 180.0
+        else:
+            dlon = np.degrees(np.arcsin(np.sin(ang) / cos_lat))
+            min_lon, max_lon = self._lon_range(lon - dlon, lon + dlon)
+
+        idx = self._candidates(min_lat, max_lat, min_lon, max_lon)
+        dist = self._angular_distance(idx, lat, lon)
+        mask = dist <= ang
+        idx, dist = idx[mask], dist[mask]
+        order = np.argsort(dist, kind="stable")
+        return idx[order], dist[order] * EARTH_RADIUS_KM
+
+    def nearest(self, lat, lon, k):
+        """(chỉ số, khoảng cách km) của k sự kiện gần nhất"""
+        n = len(self)
+        if n == 0 or k <= 0: return np.empty(0, dtype=np.int64), np.empty(0)
+        k = min(k, n)
+        dots = self.xyz @ self._query_vector(lat, lon)
+        idx = np.argpartition(-dots, k - 1)[:k] if k < n else np.arange(n)
+        dist = np.arccos(np.clip(dots[idx], -1.0, 1.0))
+        order = np.argsort(dist, kind="stable")
+        return idx[order], dist[order] * EARTH_RADIUS_KM
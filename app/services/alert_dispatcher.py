@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dotenv import load_dotenv
+from telegram import Bot
+
+load_dotenv()
+
+
+class RecentKeys:
+    """
+    Tập khóa có hạn dùng (TTL) + giới hạn số lượng (LRU).
+    Dùng để chống gửi trùng cảnh báo mà không rò rỉ bộ nhớ trên node chạy lâu.
+    """
+
+    def __init__(self, max_size=4096, ttl=24 * 3600):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._expiry = OrderedDict()
+
+    def __len__(self):
+        return len(self._expiry)
+
+    def __contains__(self, key):
+        expiry = self._expiry.get(key)
+        return expiry is not None and expiry > time.monotonic()
+
+    def add(self, key):
+        """Thêm khóa. Trả về True nếu khóa mới (chưa có hoặc đã hết hạn)."""
+        now = time.monotonic()
+        # TTL cố định -> thứ tự chèn cũng là thứ tự hết hạn, chỉ cần dọn từ đầu
+        while self._expiry:
+            oldest_key, oldest_expiry = next(iter(self._expiry.items()))
+            if oldest_expiry > now: break
+            del self._expiry[oldest_key]
+
+        if key in self._expiry: return False
+        self._expiry[key] = now + self.ttl
+        if len(self._expiry) > self.max_size:
+            self._expiry.popitem(last=False)
+        return True
+
+
+class TokenBucket:
+    """Giới hạn tốc độ gửi: rate token/giây, tối đa burst token"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            if self._tokens >= 1.0:
+                self._tokens -= 1.0
+                return
+            await asyncio.sleep((1.0 - self._tokens) / self.rate)
+
+
+class AlertDispatcher:
+    """
+    Hàng đợi cảnh báo bất đồng bộ: chu kỳ ingest chỉ submit() rồi đi tiếp,
+    worker nền gom các cảnh báo đến gần nhau thành 1 tin nhắn và gửi Telegram
+    theo token bucket, nên 1 lần gọi Telegram chậm không chặn pipeline.
+    """
+
+    TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
+    CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
+
+    QUEUE_SIZE = 256
+    COALESCE_WINDOW = 2.0 # Giây chờ gom các cảnh báo cùng đợt
+    MAX_BATCH = 20
+
+    HEADERS = {
+        "EARTHQUAKE": "🚨 [EARTHQUAKE] {n} trận động đất lớn!",
+    }
+
+    def __init__(self):
+        self.bot = None
+        if self.TELEGRAM_TOKEN:
+            try:
+                self.bot = Bot(token=self.TELEGRAM_TOKEN)
+            except Exception as e:
+                print(f"Telegram Init Failed: {e}")
+
+        # Khóa chống trùng theo mã sự kiện (usgs:<id>, COSMIC_STORM...)
+        self.seen = RecentKeys(max_size=4096, ttl=24 * 3600)
+        # Telegram: ~20 tin/phút cho 1 chat
+        self.bucket = TokenBucket(rate=20 / 60.0, burst=5)
+        self._queue = None
+        self._worker = None
+
+    def is_new(self, key):
+        """True nếu sự kiện chưa từng được cảnh báo (trong thời hạn TTL)"""
+        return self.seen.add(key)
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+            self._worker = asyncio.create_task(self._run())
+
+    def submit(self, kind, text, line=None):
+        """
+        Đưa cảnh báo vào hàng đợi (không chặn).
+        kind: nhóm để gom tin; line: dòng tóm tắt khi bị gộp chung với cảnh báo khác.
+        """
+        if not self.bot or not self.CHAT_ID: return
+        self.start()
+        try:
+            self._queue.put_nowait((kind, text, line or text))
+        except asyncio.QueueFull:
+            print(f"⚠️ [ALERT] Queue full, dropping alert: {kind}")
+
+    async def stop(self):
+        """Gửi nốt các cảnh báo đang chờ rồi dừng worker"""
+        if self._worker is None: return
+        await self._queue.put(None)
+        await self._worker
+        self._worker = None
+
+    async def _run(self):
+        running = True
+        while running:
+            item = await self._queue.get()
+            if item is None: break
+            batch = [item]
+
+            # Gom các cảnh báo đến trong cửa sổ ngắn (vd: chuỗi dư chấn M6+)
+            deadline = time.monotonic() + self.COALESCE_WINDOW
+            while len(batch) < self.MAX_BATCH:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0: break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    running = False
+                    break
+                batch.append(item)
+
+            for message in self._coalesce(batch):
+                await self.bucket.acquire()
+                await self._send(message)
+
+    def _coalesce(self, batch):
+        groups = OrderedDict()
+        for kind, text, line in batch:
+            groups.setdefault(kind, []).append((text, line))
+
+        messages = []
+        for kind, items in groups.items():
+            if len(items) == 1:
+                messages.append(items[0][0])
+            else:
+                header = self.HEADERS.get(kind, f"⚠️ [{kind}] {{n}} cảnh báo mới").format(n=len(items))
+                messages.append(header + "\n" + "\n".join(f"• {line}" for _, line in items))
+        return messages
+
+    async def _send(self, message):
+        try:
+            await self.bot.send_message(chat_id=self.CHAT_ID, text=message)
+        except Exception as e:
+            print(f"Failed to send Telegram: {e}")
+
+
+alert_dispatcher = AlertDispatcher()
@@ -0,0 +1,219 @@
+"""
+Nạp dữ liệu lịch sử USGS (GeoJSON / CSV) vào raw_logs cho các lõi AI.
+
+Mỗi snapshot mô phỏng đúng 1 lần poll feed 'all_day' tại thời điểm T:
+các động đất trong cửa sổ [T - 24h, T], cùng định dạng tóm tắt mà
+SnapshotWriter ghi ở chế độ realtime (features + sensors_data mẫu),
+kèm document đặc trưng tương ứng trong feature_store.
+
+    python -m app.services.backfill data/2024-*.csv --step-minutes 60 --workers 8
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.models.event_store import EventStore
+from app.models.features import feature_doc
+
+CSV_CHUNK_BYTES = 8 * 1024 * 1024
+INSERT_BATCH = 1000
+SAMPLE_SIZE = 20 # Giống SnapshotWriter.SAMPLE_SIZE
+
+
+# --- PARSE (chạy trong process pool) ---
+def _event(event_id, time_ms, place, lat, lon, mag, sig):
+    """Tuple sự kiện thô (None nếu bị lọc, cùng ngưỡng M1.0 như realtime)"""
+    if mag is None or mag < 1.0 or lat is None or lon is None: return None
+    if sig is None:
+        # CSV của USGS không có 'sig' -> dùng công thức significance theo magnitude của USGS
+        sig = mag * 100.0 * (mag / 6.5)
+    return (int(time_ms), f"usgs:{event_id}", place or "", float(lat), float(lon), float(mag), float(sig))
+
+
+def _parse_iso_ms(value):
+    return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() * 1000.0
+
+
+def _to_float(value):
+    try:
+        return float(value) if value not in (None, "") else None
+    except ValueError:
+        return None
+
+
+def parse_csv_chunk(path, start, end, header):
+    """Parse đoạn byte [start, end) của file CSV (đã căn theo dòng)"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        text = f.read(end - start).decode("utf-8")
+    if start == 0:
+        text = text.split("\n", 1)[1] if "\n" in text else ""
+
+    events = []
+    for row in csv.DictReader(io.StringIO(text), fieldnames=header):
+        try:
+            time_ms = _parse_iso_ms(row["time"])
+        except (KeyError, ValueError, AttributeError):
+            continue
+        ev = _event(row.get("id"), time_ms, row.get("place"),
+                    _to_float(row.get("latitude")), _to_float(row.get("longitude")),
+                    _to_float(row.get("mag")), None)
+        if ev: events.append(ev)
+    return events
+
+
+def parse_geojson_file(path):
+    with open(path, "rb") as f:
+        features = json.load(f).get("features", [])
+
+    events = []
+    for q in features:
+        props = q.get("properties") or {}
+        coords = (q.get("geometry") or {}).get("coordinates") or [None, None]
+        ev = _event(q.get("id"), props.get("time") or 0, props.get("place"),
+                    coords[1], coords[0], props.get("mag"), props.get("sig"))
+        if ev: events.append(ev)
+    return events
+
+
+def build_snapshots(times, event_ids, places, lat, lon, mag, sig, snapshot_times, window_ms):
+    """
+    Dựng các document raw_logs cho 1 đoạn thời gian.
+    Các mảng sự kiện đã sắp xếp tăng dần theo thời gian.
+    """
+    energy = np.clip(mag / 9.0, 0.0, 1.0)
+    anomaly = sig / 1000.0
+    type_code = np.zeros(len(times), dtype=np.int8)
+    place_idx = np.arange(len(times), dtype=np.int32)
+
+    docs, feature_docs = [], []
+    lo_idx = np.searchsorted(times, snapshot_times - window_ms, side="left")
+    hi_idx = np.searchsorted(times, snapshot_times, side="right")
+    for t, lo, hi in zip(snapshot_times.tolist(), lo_idx.tolist(), hi_idx.tolist()):
+        if hi <= lo: continue
+        window = slice(lo, hi)
+        store = EventStore(
+            {"lat": lat[window], "lon": lon[window], "energy_level": energy[window],
+             "anomaly_score": anomaly[window], "raw_val": mag[window]},
+            type_code[window], place_idx[window], places, event_ids[window]
+        )
+        # Feed USGS sắp xếp mới nhất trước -> lấy mẫu từ cuối cửa sổ
+        sample = store.select(np.arange(len(store) - 1, max(len(store) - SAMPLE_SIZE, 0) - 1, -1))
+        timestamp = datetime.fromtimestamp(t / 1000.0, tz=timezone.utc)
+        features = store.global_features()
+        docs.append({
+            "timestamp": timestamp,
+            "total_events": len(store),
+            "max_magnitude": store.max("raw_val"),
+            "sensors_data": sample.to_records(),
+            "features": [float(x) for x in features],
+            "source": "backfill"
+        })
+        feature_docs.append(feature_doc(timestamp, store, sample, features, source="backfill"))
+    return docs, feature_docs
+
+
+# --- ĐIỀU PHỐI (process chính) ---
+def _csv_chunks(path):
+    """Chia file CSV thành các đoạn byte căn theo ranh giới dòng"""
+    size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        header = next(csv.reader([f.readline().decode("utf-8-sig")]))
+        bounds = [0]
+        while bounds[-1] < size:
+            f.seek(min(bounds[-1] + CSV_CHUNK_BYTES, size))
+            f.readline()
+            bounds.append(min(f.tell(), size))
+    return header, list(zip(bounds[:-1], bounds[1:]))
+
+
+def load_events(paths, pool):
+    futures = []
+    for path in paths:
+        if path.lower().endswith(".csv"):
+            header, chunks = _csv_chunks(path)
+            futures += [pool.submit(parse_csv_chunk, path, a, b, header) for a, b in chunks]
+        else:
+            futures.append(pool.submit(parse_geojson_file, path))
+
+    # Các file lưu trữ có thể chồng lấn -> khử trùng theo mã sự kiện
+    events = {}
+    for fut in as_completed(futures):
+        for ev in fut.result():
+            events.setdefault(ev[1], ev)
+    return sorted(events.values())
+
+
+def run(paths, step_minutes=60, window_hours=24, workers=None, dry_run=False):
+    started = time.perf_counter()
+    collection = feature_collection = None
+    if not dry_run:
+        from app.core.database import Database # Chỉ kết nối DB ở process chính
+        collection = Database.get_collection("raw_logs")
+        feature_collection = Database.get_collection("feature_store")
+        if collection is None:
+            raise SystemExit("❌ [BACKFILL] MongoDB is not configured (MONGO_URI).")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        events = load_events(paths, pool)
+        if not events:
+            print("⚠️ [BACKFILL] No events found.")
+            return 0
+        print(f"📥 [BACKFILL] Parsed {len(events)} events in {time.perf_counter() - started:.1f}s")
+
+        times = np.array([e[0] for e in events], dtype=np.int64)
+        event_ids = np.array([e[1] for e in events], dtype=object)
+        places = [e[2] for e in events]
+        cols = np.array([e[3:] for e in events], dtype=np.float64)
+
+        step_ms, window_ms = step_minutes * 60_000, window_hours * 3_600_000
+        first = (times[0] // step_ms + 1) * step_ms
+        snapshot_times = np.arange(first, times[-1] + step_ms, step_ms, dtype=np.int64)
+
+        # Chia theo khoảng thời gian, mỗi worker nhận thêm phần đệm cửa sổ phía trước
+        n_parts = max(1, min(len(snapshot_times), (workers or os.cpu_count() or 1) * 4))
+        futures = []
+        for part in np.array_split(snapshot_times, n_parts):
+            if len(part) == 0: continue
+            lo = np.searchsorted(times, part[0] - window_ms, side="left")
+            hi = np.searchsorted(times, part[-1], side="right")
+            sl = slice(lo, hi)
+            futures.append(pool.submit(
+                build_snapshots, times[sl], event_ids[sl], places[lo:hi],
+                cols[sl, 0], cols[sl, 1], cols[sl, 2], cols[sl, 3], part, window_ms
+            ))
+
+        total = 0
+        for fut in as_completed(futures):
+            docs, feature_docs = fut.result()
+            if collection is not None:
+                for i in range(0, len(docs), INSERT_BATCH):
+                    collection.insert_many(docs[i:i + INSERT_BATCH], ordered=False)
+                    feature_collection.insert_many(feature_docs[i:i + INSERT_BATCH], ordered=False)
+            total += len(docs)
+
+    print(f"✅ [BACKFILL] {'Built' if dry_run else 'Inserted'} {total} snapshots "
+          f"in {time.perf_counter() - started:.1f}s")
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Backfill USGS archive files into raw_logs")
+    parser.add_argument("paths", nargs="+", help="USGS GeoJSON (.geojson/.json) or CSV catalog files")
+    parser.add_argument("--step-minutes", type=int, default=60, help="Khoảng cách giữa 2 snapshot")
+    parser.add_argument("--window-hours", type=int, default=24, help="Cửa sổ sự kiện của mỗi snapshot")
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định = số CPU)")
+    parser.add_argument("--dry-run", action="store_true", help="Chỉ parse và dựng snapshot, không ghi DB")
+    args = parser.parse_args(argv)
+    run(args.paths, args.step_minutes, args.window_hours, args.workers, args.dry_run)
+
+
+if __name__ == "__main__":
+    main()
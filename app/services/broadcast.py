@@ -0,0 +1,48 @@
+import asyncio
+
+
+class Subscription:
+    """Hàng đợi riêng của 1 client. overflowed = True nếu đã từng bị bỏ frame vì client chậm."""
+
+    def __init__(self, maxsize):
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    async def get(self):
+        return await self.queue.get()
+
+    def reset(self):
+        """Xóa các frame đang chờ (dùng khi client cần đồng bộ lại toàn bộ)"""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.overflowed = False
+
+
+class BroadcastHub:
+    """
+    Fan-out 1 producer -> N subscriber: frame được encode 1 lần, cùng 1 object bytes/str
+    được đẩy vào hàng đợi có giới hạn của từng client. Client chậm bị bỏ frame cũ nhất
+    (backpressure) thay vì làm hàng đợi phình vô hạn.
+    """
+
+    def __init__(self, maxsize=4):
+        self.maxsize = maxsize
+        self.subscribers = set()
+
+    def __len__(self):
+        return len(self.subscribers)
+
+    def subscribe(self):
+        sub = Subscription(self.maxsize)
+        self.subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        self.subscribers.discard(sub)
+
+    def publish(self, frame):
+        for sub in self.subscribers:
+            if sub.queue.full():
+                sub.queue.get_nowait() # Bỏ frame cũ nhất
+                sub.overflowed = True
+            sub.queue.put_nowait(frame)
@@ -1,204 +1,474 @@
 import httpx
 import asyncio
+import heapq
 import os
+import time
+import numpy as np
 from dotenv import load_dotenv
-from telegram import Bot
-from datetime import datetime, timezone
+from datetime import datetime, timezone, timedelta
 
 # --- [IMPORTS CORE] ---
-from app.core.database import Database
+from app.models.event_store import EventStore
+from app.services.alert_dispatcher import alert_dispatcher
+from app.services.event_stream import event_stream
+from app.services.geojson_stream import GeoJSONFeatureStream
+from app.services.response_cache import EncodedPayload
+from app.services.snapshot_writer import snapshot_writer
+from app.services.worker_sync import worker_sync
 
 # --- [IMPORTS ENGINE - LIÊN KẾT VẬT LÝ] ---
 from app.upt_engine.reactor_core import upt_reactor
+from app.upt_engine.reactor_link import reactor_link
 from app.upt_engine.formulas import UPTMath
 from app.upt_engine.deep_core import guardian_brain
 
 load_dotenv()
 
 class DisasterService:
-    
+
     # API ENDPOINTS
-    USGS_URL = "https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/all_day.geojson"
-    NASA_EONET = "https://eonet.gsfc.nasa.gov/api/v3/events?status=open&days=30"
-    
+    # Feed USGS: all_hour | all_day | all_week | all_month (hoặc 2.5_week, 4.5_month...)
+    USGS_FEED = os.getenv("USGS_FEED", "all_day")
+    USGS_URL = f"https://earthquake.usgs.gov/earthquakes/feed/v1.0/summary/{USGS_FEED}.geojson"
+    # Feed lớn (week/month, hàng chục MB) được parse dạng stream thay vì resp.json()
+    USGS_STREAMING = os.getenv("USGS_STREAMING", "auto").lower() in ("1", "true", "yes") or (
+        os.getenv("USGS_STREAMING", "auto").lower() == "auto" and USGS_FEED.endswith(("_week", "_month"))
+    )
+    USGS_STREAM_CHUNK = 64 * 1024
+    NASA_EONET = "https://eonet.gsfc.nasa.gov/api/v3/events"
+    NASA_SOLAR = "https://api.nasa.gov/DONKI/FLR"
     _NASA_KEY = os.getenv("NASA_API_KEY", "DEMO_KEY")
-    NASA_SOLAR = f"https://api.nasa.gov/DONKI/FLR?startDate=2024-01-01&api_key={_NASA_KEY}"
 
-    TELEGRAM_TOKEN = os.getenv("TELEGRAM_TOKEN")
-    CHAT_ID = os.getenv("TELEGRAM_CHAT_ID")
-    
-    bot = None
-    if TELEGRAM_TOKEN:
+    # Cửa sổ thời gian trượt (Moving Window) cho EONET / DONKI
+    EONET_WINDOW_DAYS = 30
+    SOLAR_WINDOW_DAYS = 30
+    SOLAR_MAX_FLARES = 100 # Giới hạn số flare giữ trong RAM
+    EONET_RESYNC_HOURS = 6 # Chu kỳ đồng bộ đầy đủ danh sách sự kiện EONET đang mở
+
+    # Kho sự kiện dạng cột, thay thế list dict LATEST_DATA cũ
+    STORE = EventStore.empty()
+    # Response /disasters/live đã serialize + nén sẵn, dựng lại mỗi lần publish
+    LIVE_VERSION = 0
+    LIVE_PAYLOAD = EncodedPayload.build(0, {"source": "UPT_GUARDIAN_CACHE", "count": 0, "data": []})
+
+    # STORE do bộ lập lịch ingest duy trì; quá TTL thì /realtime/usgs nhờ bộ lập lịch chạy sớm USGS
+    REALTIME_TTL = float(os.getenv("REALTIME_CACHE_TTL", 60))
+    _publish_lock = asyncio.Lock()
+
+    # --- [HTTP POOL] Client dùng chung, giữ kết nối TLS giữa các chu kỳ ---
+    _client: httpx.AsyncClient = None
+
+    # Validator HTTP (ETag / Last-Modified) theo từng nguồn
+    _validators = {}
+    # Kết quả parse gần nhất theo từng nguồn (dùng lại khi nhận 304 hoặc khi nguồn lỗi)
+    SOURCES = ("usgs", "eonet", "solar")
+    _source_sensors = {name: [] for name in SOURCES}
+    # Lần gọi upstream gần nhất theo từng nguồn (kể cả 304 / lỗi / rỗng)
+    _last_attempt = {name: 0.0 for name in SOURCES}
+
+    # Con trỏ thời gian + bộ nhớ sự kiện đã gộp cho EONET / DONKI
+    _eonet_events = {}
+    _eonet_cursor = None
+    _eonet_synced_at = None # Lần đồng bộ đầy đủ gần nhất (status=open) của EONET
+    _solar_flares = {}
+    _solar_cursor = None
+
+    @staticmethod
+    def get_client():
+        """Trả về AsyncClient dùng chung (tạo mới nếu chưa có hoặc đã đóng)"""
+        if DisasterService._client is None or DisasterService._client.is_closed:
+            DisasterService._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(30.0, connect=10.0),
+                limits=httpx.Limits(max_connections=10, max_keepalive_connections=5, keepalive_expiry=300.0),
+                headers={"User-Agent": "UPT-Guardian/28.1"}
+            )
+        return DisasterService._client
+
+    @staticmethod
+    async def close():
+        """Đóng connection pool khi tắt server"""
+        if DisasterService._client is not None and not DisasterService._client.is_closed:
+            await DisasterService._client.aclose()
+        DisasterService._client = None
+
+    @staticmethod
+    def _conditional_headers(source, url):
+        headers = {}
+        cached = DisasterService._validators.get(source)
+        if cached and cached["url"] == url:
+            if cached.get("etag"): headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"): headers["If-Modified-Since"] = cached["last_modified"]
+        return headers
+
+    @staticmethod
+    def _remember_validators(source, url, resp):
+        DisasterService._validators[source] = {
+            "url": url,
+            "etag": resp.headers.get("etag"),
+            "last_modified": resp.headers.get("last-modified")
+        }
+
+    @staticmethod
+    async def _conditional_get(source, url, timeout):
+        """
+        GET có điều kiện (If-None-Match / If-Modified-Since).
+        Trả về None nếu upstream báo 304 (dữ liệu không đổi).
+        """
+        headers = DisasterService._conditional_headers(source, url)
+        resp = await DisasterService.get_client().get(url, headers=headers, timeout=timeout)
+        if resp.status_code == 304:
+            return None
+        resp.raise_for_status()
+
+        DisasterService._remember_validators(source, url, resp)
+        return resp
+
+    # --- 1. USGS (ĐỘNG ĐẤT) ---
+    @staticmethod
+    def _usgs_sensor(q):
+        """Chuyển 1 Feature USGS thành sensor record (None nếu bị lọc)"""
+        props = q['properties']
+        mag = props.get('mag', 0) or 0
+
+        if mag < 1.0: return None
+
+        # Energy chuẩn hóa (0.0 - 1.0)
+        energy = min(max(mag / 9.0, 0.0), 1.0)
+        return {
+            "id": f"usgs:{q.get('id')}",
+            "type": "EARTHQUAKE", "place": props['place'],
+            "lat": q['geometry']['coordinates'][1], "lon": q['geometry']['coordinates'][0],
+            "energy_level": energy, "anomaly_score": (props.get('sig', 0) or 0)/1000.0,
+            "raw_val": mag
+        }
+
+    @staticmethod
+    def _parse_usgs(features):
+        sensors = (DisasterService._usgs_sensor(q) for q in features)
+        return [s for s in sensors if s is not None]
+
+    @staticmethod
+    async def _iter_usgs_stream(resp):
+        """
+        Pipeline generator: byte stream -> Feature -> sensor record.
+        Chỉ giảm bộ nhớ đỉnh với feed lớn (không giữ cả body + cây JSON); snapshot vẫn được
+        publish 1 lần khi parse xong cả feed để diff / cảnh báo / ghi DB không thấy snapshot dở.
+        """
+        parser = GeoJSONFeatureStream()
+        async for chunk in resp.aiter_bytes(DisasterService.USGS_STREAM_CHUNK):
+            for q in parser.feed(chunk):
+                sensor = DisasterService._usgs_sensor(q)
+                if sensor is not None:
+                    yield sensor
+        parser.close()
+
+    @staticmethod
+    async def _fetch_usgs():
+        url = DisasterService.USGS_URL
+        if not DisasterService.USGS_STREAMING:
+            resp = await DisasterService._conditional_get("usgs", url, 30.0)
+            if resp is None:
+                return DisasterService._source_sensors["usgs"]
+            sensors = DisasterService._parse_usgs(resp.json().get('features', []))
+        else:
+            headers = DisasterService._conditional_headers("usgs", url)
+            async with DisasterService.get_client().stream("GET", url, headers=headers, timeout=120.0) as resp:
+                if resp.status_code == 304:
+                    return DisasterService._source_sensors["usgs"]
+                resp.raise_for_status()
+                sensors = [s async for s in DisasterService._iter_usgs_stream(resp)]
+                DisasterService._remember_validators("usgs", url, resp)
+
+        DisasterService._source_sensors["usgs"] = sensors
+        return sensors
+
+    # --- 2. NASA EONET (THIÊN TAI BỀ MẶT) ---
+    EONET_META = {
+        'wildfires': ("WILDFIRE", 0.75),
+        'volcanoes': ("VOLCANO", 0.95),
+        'severeStorms': ("STORM", 0.85),
+        'seaLakeIce': ("ICEBERG", 0.4)
+    }
+
+    @staticmethod
+    def _parse_eonet(events):
+        sensors = []
+        for ev in events[:500]:
+            if not ev.get('geometry'): continue
+            cat = ev['categories'][0]['id']
+            if cat not in DisasterService.EONET_META: continue
+            geo_raw = ev['geometry'][0]['coordinates']
+
+            # Xử lý tọa độ phức tạp (Point vs Polygon)
+            lon, lat = 0, 0
+            if isinstance(geo_raw[0], list): # Polygon
+                lon, lat = geo_raw[0][0], geo_raw[0][1]
+            else: # Point
+                lon, lat = geo_raw[0], geo_raw[1]
+
+            d_type, energy = DisasterService.EONET_META[cat]
+            sensors.append({
+                "id": f"eonet:{ev.get('id')}",
+                "type": d_type, "place": ev['title'],
+                "lat": lat, "lon": lon,
+                "energy_level": energy, "anomaly_score": 0.6,
+                "raw_val": 5.0
+            })
+        return sensors
+
+    @staticmethod
+    async def _fetch_eonet():
+        now = datetime.now(timezone.utc)
+        window_start = now - timedelta(days=DisasterService.EONET_WINDOW_DAYS)
+
+        # Lần đầu / định kỳ: lấy toàn bộ sự kiện đang mở trong cửa sổ (thay cả bộ nhớ).
+        # Các lần sau: chỉ lấy từ con trỏ (lùi 1 ngày để chồng lấn), status=all để thấy sự kiện vừa đóng
+        synced_at = DisasterService._eonet_synced_at
+        full = (DisasterService._eonet_cursor is None or synced_at is None
+                or now - synced_at >= timedelta(hours=DisasterService.EONET_RESYNC_HOURS))
+        if full:
+            url = f"{DisasterService.NASA_EONET}?status=open&days={DisasterService.EONET_WINDOW_DAYS}"
+        else:
+            start = DisasterService._eonet_cursor - timedelta(days=1)
+            url = f"{DisasterService.NASA_EONET}?status=all&start={start:%Y-%m-%d}&end={now:%Y-%m-%d}"
+
+        resp = await DisasterService._conditional_get("eonet", url, 30.0)
+        if resp is None:
+            DisasterService._eonet_cursor = now
+            return DisasterService._source_sensors["eonet"]
+
+        events = DisasterService._eonet_events
+        if full:
+            events.clear()
+            DisasterService._eonet_synced_at = now
+        for ev in resp.json().get('events', []):
+            if not ev.get('id'): continue
+            if ev.get('closed'):
+                events.pop(ev['id'], None) # Sự kiện đã đóng -> bỏ ngay (như truy vấn status=open cũ)
+            else:
+                events[ev['id']] = ev
+
+        # Loại bỏ sự kiện đã trôi ra khỏi cửa sổ thời gian
+        for ev_id, ev in list(events.items()):
+            last_seen = DisasterService._parse_time((ev.get('geometry') or [{}])[-1].get('date'))
+            if last_seen is None or last_seen < window_start:
+                del events[ev_id]
+        # Đã phủ tới ngày kết thúc của request -> lần sau chỉ hỏi từ đây (kể cả khi không có sự kiện mới)
+        DisasterService._eonet_cursor = now
+
+        sensors = DisasterService._parse_eonet(list(DisasterService._eonet_events.values()))
+        DisasterService._source_sensors["eonet"] = sensors
+        return sensors
+
+    # --- 3. NASA SOLAR (VẬT LÝ THIÊN VĂN) ---
+    @staticmethod
+    def _parse_solar(flares):
+        sensors = []
+        # Lấy 3 sự kiện lóa mặt trời mới nhất
+        latest_flares = heapq.nlargest(3, flares, key=lambda x: x.get('beginTime') or '')
+
+        for flare in latest_flares:
+            class_type = flare.get('classType') or 'B'
+            # Chuyển đổi Class thành Energy (Logarithmic Scale)
+            energy = 0.1
+            if 'C' in class_type: energy = 0.3
+            if 'M' in class_type: energy = 0.6
+            if 'X' in class_type: energy = 1.0 # Cực đại
+
+            sensors.append({
+                "id": f"donki:{flare.get('flareID') or flare.get('beginTime')}",
+                "type": "SOLAR_FLARE",
+                "place": f"Sunspot {flare.get('activeRegionNum', 'Unknown')} ({class_type})",
+                "lat": 90.0, "lon": 0.0, # Điểm tác động cực từ
+                "energy_level": energy, "anomaly_score": 0.99,
+                "raw_val": energy * 10
+            })
+        return sensors
+
+    @staticmethod
+    async def _fetch_solar():
+        now = datetime.now(timezone.utc)
+        if DisasterService._solar_cursor is None:
+            start = now - timedelta(days=DisasterService.SOLAR_WINDOW_DAYS)
+        else:
+            start = DisasterService._solar_cursor - timedelta(days=1)
+        url = (f"{DisasterService.NASA_SOLAR}?startDate={start:%Y-%m-%d}&endDate={now:%Y-%m-%d}"
+               f"&api_key={DisasterService._NASA_KEY}")
+
+        resp = await DisasterService._conditional_get("solar", url, 20.0)
+        # Đã phủ tới ngày kết thúc của request -> lần sau chỉ hỏi từ đây (kể cả khi không có flare)
+        DisasterService._solar_cursor = now
+        if resp is None:
+            return DisasterService._source_sensors["solar"]
+
+        flares = resp.json()
+        if flares and isinstance(flares, list):
+            for flare in flares:
+                key = flare.get('flareID') or flare.get('beginTime')
+                if key: DisasterService._solar_flares[key] = flare
+
+            # Giữ lại N flare mới nhất để bộ nhớ không tăng vô hạn
+            kept = heapq.nlargest(DisasterService.SOLAR_MAX_FLARES, DisasterService._solar_flares.items(),
+                                  key=lambda kv: kv[1].get('beginTime') or '')
+            DisasterService._solar_flares = dict(kept)
+
+        sensors = DisasterService._parse_solar(list(DisasterService._solar_flares.values()))
+        DisasterService._source_sensors["solar"] = sensors
+        return sensors
+
+    @staticmethod
+    def _parse_time(value):
+        """Parse thời gian ISO của NASA ('2024-01-01T00:00Z' / '...:00Z')"""
+        if not value: return None
         try:
-            bot = Bot(token=TELEGRAM_TOKEN)
-        except Exception as e:
-            print(f"Telegram Init Failed: {e}")
-    
-    alerted_events = set()
-    LATEST_DATA = [] 
+            return datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
 
     @staticmethod
-    async def send_telegram_alert(message):
-        if not DisasterService.bot or not DisasterService.CHAT_ID: return
+    async def refresh_source(name):
+        """
+        Làm mới 1 nguồn dữ liệu (usgs | eonet | solar).
+        Trả về True nếu có dữ liệu mới, False nếu upstream báo không đổi (304).
+        Lỗi HTTP được ném ra để bộ lập lịch xử lý backoff.
+        """
+        fetchers = {
+            "usgs": DisasterService._fetch_usgs,
+            "eonet": DisasterService._fetch_eonet,
+            "solar": DisasterService._fetch_solar,
+        }
+        before = DisasterService._source_sensors[name]
         try:
-            await DisasterService.bot.send_message(chat_id=DisasterService.CHAT_ID, text=message)
-        except Exception as e:
-            print(f"Failed to send Telegram: {e}")
+            sensors = await fetchers[name]()
+        finally:
+            DisasterService._last_attempt[name] = time.monotonic()
+        return sensors is not before
+
+    @staticmethod
+    async def refresh(max_age=None):
+        """
+        Trả về STORE do bộ lập lịch ingest duy trì. Nếu USGS chưa được gọi trong max_age giây
+        thì nhờ bộ lập lịch chạy sớm nguồn này (1 lần dùng chung cho các request đồng thời,
+        tôn trọng backoff / Retry-After). Không bao giờ gọi đồng loạt mọi nguồn.
+        """
+        # Follower không gọi upstream: dữ liệu đến từ worker chính qua worker_sync
+        if not reactor_link.is_primary:
+            return DisasterService.STORE
+
+        max_age = DisasterService.REALTIME_TTL if max_age is None else max_age
+        if time.monotonic() - DisasterService._last_attempt["usgs"] >= max_age:
+            from app.services.ingest_scheduler import ingest_scheduler
+            # shield: client ngắt kết nối không hủy lần fetch đang dùng chung
+            await asyncio.shield(ingest_scheduler.run_now("usgs"))
+        return DisasterService.STORE
 
     @staticmethod
     async def fetch_all_realtime():
+        results = await asyncio.gather(
+            *(DisasterService.refresh_source(name) for name in DisasterService.SOURCES),
+            return_exceptions=True
+        )
+        for name, result in zip(DisasterService.SOURCES, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching data ({name}): {result}")
+
+        return await DisasterService.publish()
+
+    @staticmethod
+    async def apply_shared_sources(sources):
+        """Follower: nhận dữ liệu nguồn do worker chính xuất bản rồi publish cục bộ"""
+        for name in DisasterService.SOURCES:
+            DisasterService._source_sensors[name] = sources.get(name) or []
+        return await DisasterService.publish()
+
+    @staticmethod
+    async def publish():
+        """Gộp dữ liệu mới nhất của các nguồn -> cảnh báo, lò phản ứng, cache, AI, DB"""
+        # Tuần tự hóa: delta của mỗi lần publish phải tính trên snapshot liền trước
+        async with DisasterService._publish_lock:
+            return await DisasterService._publish()
+
+    @staticmethod
+    async def _publish():
+        # Cảnh báo, tác động lò và ghi DB chỉ chạy ở worker chính (không nhân N lần khi nhiều worker)
+        primary = reactor_link.is_primary
         sensors = []
-        new_alerts = []
-        
-        # Biến theo dõi tổng năng lượng vũ trụ (Solar X-Ray Flux)
-        total_cosmic_energy = 0.0
-
-        async with httpx.AsyncClient() as client:
-            try:
-                # Tăng timeout để đảm bảo fetch được hết các nguồn
-                resp_usgs, resp_nasa, resp_solar = await asyncio.gather(
-                    client.get(DisasterService.USGS_URL, timeout=30.0),
-                    client.get(DisasterService.NASA_EONET, timeout=30.0),
-                    client.get(DisasterService.NASA_SOLAR, timeout=20.0),
-                    return_exceptions=True
+        for name in DisasterService.SOURCES:
+            sensors.extend(DisasterService._source_sensors[name])
+
+        store = EventStore.from_sensors(sensors)
+
+        # Diff theo mã sự kiện: chỉ sự kiện mới / bị sửa mới cần xét cảnh báo
+        delta = store.diff(DisasterService.STORE)
+        changed = np.concatenate(delta[:2])
+
+        # Cảnh báo Telegram (> 6.0): lọc vectorized, chỉ duyệt các sự kiện lớn
+        is_major = store.type_mask("EARTHQUAKE")[changed] & (store.raw_val[changed] >= 6.0)
+        for i in (changed[is_major].tolist() if primary else []):
+            place = store.places[store.place_idx[i]]
+            mag = float(store.raw_val[i])
+            # Chống trùng theo mã sự kiện USGS (giới hạn bộ nhớ + TTL), không theo tên địa điểm
+            if alert_dispatcher.is_new(store.ids[i] or place):
+                alert_dispatcher.submit(
+                    "EARTHQUAKE",
+                    f"🚨 [EARTHQUAKE] Động đất lớn!\nVị trí: {place}\nCường độ: {mag} Richter",
+                    line=f"M{mag} - {place}"
                 )
 
-                # 1. XỬ LÝ USGS (ĐỘNG ĐẤT)
-                if isinstance(resp_usgs, httpx.Response) and resp_usgs.status_code == 200:
-                    features = resp_usgs.json().get('features', [])
-                    
-                    for q in features:
-                        props = q['properties']
-                        mag = props.get('mag', 0) or 0
-                        
-                        if mag < 1.0: continue 
-                        
-                        place = props['place']
-                        # Energy chuẩn hóa (0.0 - 1.0)
-                        energy = min(max(mag / 9.0, 0.0), 1.0)
-                        
-                        # Cảnh báo Telegram (> 6.0)
-                        if mag >= 6.0:
-                            msg = f"🚨 [EARTHQUAKE] Động đất lớn!\nVị trí: {place}\nCường độ: {mag} Richter"
-                            if place not in DisasterService.alerted_events:
-                                DisasterService.alerted_events.add(place)
-                                new_alerts.append(msg)
-                                
-                                # Gây sốc vật lý tức thì cho lò phản ứng
-                                print(f"⚠️ TRIGGERING REACTOR SHOCK: {place}")
-                                upt_reactor.update_external_stress(energy)
-
-                        sensors.append({
-                            "type": "EARTHQUAKE", "place": place,
-                            "lat": q['geometry']['coordinates'][1], "lon": q['geometry']['coordinates'][0],
-                            "energy_level": energy, "anomaly_score": props.get('sig',0)/1000.0,
-                            "raw_val": mag
-                        })
-
-                # 2. XỬ LÝ NASA EONET (THIÊN TAI BỀ MẶT)
-                if isinstance(resp_nasa, httpx.Response) and resp_nasa.status_code == 200:
-                    events = resp_nasa.json().get('events', [])
-                    for ev in events[:500]: 
-                        if not ev.get('geometry'): continue
-                        cat = ev['categories'][0]['id']
-                        geo_raw = ev['geometry'][0]['coordinates']
-                        
-                        # Xử lý tọa độ phức tạp (Point vs Polygon)
-                        lon, lat = 0, 0
-                        if isinstance(geo_raw[0], list): # Polygon
-                            lon, lat = geo_raw[0][0], geo_raw[0][1]
-                        else: # Point
-                            lon, lat = geo_raw[0], geo_raw[1]
-                        
-                        meta = {
-                            'wildfires': ("WILDFIRE", 0.75),
-                            'volcanoes': ("VOLCANO", 0.95),
-                            'severeStorms': ("STORM", 0.85),
-                            'seaLakeIce': ("ICEBERG", 0.4)
-                        }
-                        
-                        if cat in meta:
-                            d_type, energy = meta[cat]
-                            sensors.append({
-                                "type": d_type, "place": ev['title'],
-                                "lat": lat, "lon": lon,
-                                "energy_level": energy, "anomaly_score": 0.6,
-                                "raw_val": 5.0
-                            })
-
-                # 3. XỬ LÝ NASA SOLAR (VẬT LÝ THIÊN VĂN)
-                if isinstance(resp_solar, httpx.Response) and resp_solar.status_code == 200:
-                    flares = resp_solar.json()
-                    if flares and isinstance(flares, list):
-                        # Lấy 3 sự kiện lóa mặt trời mới nhất
-                        latest_flares = sorted(flares, key=lambda x: x.get('beginTime', ''), reverse=True)[:3]
-                        
-                        for flare in latest_flares:
-                            class_type = flare.get('classType', 'B')
-                            # Chuyển đổi Class thành Energy (Logarithmic Scale)
-                            energy = 0.1
-                            if 'C' in class_type: energy = 0.3
-                            if 'M' in class_type: energy = 0.6
-                            if 'X' in class_type: energy = 1.0 # Cực đại
-                            
-                            # Cập nhật tổng năng lượng vũ trụ
-                            total_cosmic_energy = max(total_cosmic_energy, energy)
-                            
-                            sensors.append({
-                                "type": "SOLAR_FLARE", 
-                                "place": f"Sunspot {flare.get('activeRegionNum', 'Unknown')} ({class_type})",
-                                "lat": 90.0, "lon": 0.0, # Điểm tác động cực từ
-                                "energy_level": energy, "anomaly_score": 0.99,
-                                "raw_val": energy * 10
-                            })
-
-            except Exception as e:
-                print(f"Error fetching data: {e}")
+                # Gây sốc vật lý tức thì cho lò phản ứng
+                print(f"⚠️ TRIGGERING REACTOR SHOCK: {place}")
+                upt_reactor.update_external_stress(float(store.energy_level[i]))
+
+        # Cập nhật tổng năng lượng vũ trụ
+        total_cosmic_energy = store.max_by_type("energy_level").get("SOLAR_FLARE", 0.0)
 
         # --- [LEVEL 4 LOGIC] KÍCH HOẠT LIÊN KẾT VŨ TRỤ (COSMIC COUPLING) ---
-        if total_cosmic_energy > 0:
+        if primary and total_cosmic_energy > 0:
             # Tính toán hệ số tác động dựa trên công thức UPT
             coupling_factor = UPTMath.calculate_geomagnetic_coupling(total_cosmic_energy)
-            
+
             # Tiêm vào lò phản ứng (Gây nhiễu từ trường tồn dư)
             if coupling_factor > 0.1:
                 upt_reactor.inject_cosmic_interference(coupling_factor)
-                
+
                 # Cảnh báo Telegram nếu tác động lớn
                 if coupling_factor > 0.4:
                     msg = f"⚠️ [COSMIC ALERT] Phát hiện Bão từ mạnh!\nHệ số liên kết: {coupling_factor:.3f}\nLò phản ứng đang chịu nhiễu loạn pha."
-                    if "COSMIC_STORM" not in DisasterService.alerted_events:
-                         DisasterService.alerted_events.add("COSMIC_STORM")
-                         new_alerts.append(msg)
+                    if alert_dispatcher.is_new("COSMIC_STORM"):
+                         alert_dispatcher.submit("COSMIC", msg)
         # -------------------------------------------------------------------
 
-        for msg in new_alerts:
-            await DisasterService.send_telegram_alert(msg)
+        if len(store):
+            store.spatial_index() # Dựng chỉ mục không gian ngay trong chu kỳ ingest
+            version = DisasterService.LIVE_VERSION + 1
+            payload = await asyncio.to_thread(
+                EncodedPayload.build, version,
+                {"source": "UPT_GUARDIAN_CACHE", "count": len(store), "data": store.to_records()}
+            )
+            DisasterService.STORE = store
+            DisasterService.LIVE_VERSION = version
+            DisasterService.LIVE_PAYLOAD = payload
+            print(f"✅ [CACHE] Updated {len(store)} REAL events from global sensors.")
+
+            # Đẩy delta cho các client WebSocket /disasters/ws
+            event_stream.publish_delta(version, store, delta)
 
-        if sensors:
-            DisasterService.LATEST_DATA = sensors
-            print(f"✅ [CACHE] Updated {len(sensors)} REAL events from global sensors.")
-            
             # --- [AI FEED] NẠP DỮ LIỆU THẬT VÀO NÃO AI ---
-            guardian_brain.update_realtime_state(sensors)
+            features = guardian_brain.update_realtime_state(store)
             # ---------------------------------------------
-            
-            # Lưu Snapshot vào MongoDB
-            try:
-                collection = Database.get_collection("raw_logs")
-                if collection is not None:
-                    log_entry = {
-                        "timestamp": datetime.now(timezone.utc),
-                        "total_events": len(sensors),
-                        "max_magnitude": max([s['raw_val'] for s in sensors]) if sensors else 0,
-                        "sensors_data": sensors 
-                    }
-                    collection.insert_one(log_entry)
-            except Exception as e:
-                print(f"⚠️ [DB SAVE ERROR] Could not save to MongoDB: {e}")
-            
-        return sensors
+
+            # Lưu Snapshot vào MongoDB (Write-Behind, không chặn event loop)
+            if primary:
+                snapshot_writer.submit(store, features)
+
+        if primary:
+            await worker_sync.export(DisasterService._source_sensors)
+        return store
+
+    @staticmethod
+    def get_store():
+        return DisasterService.STORE
 
     @staticmethod
     def get_latest_data():
-        return DisasterService.LATEST_DATA
\ No newline at end of file
+        return DisasterService.STORE.to_records()
@@ -0,0 +1,42 @@
+from app.services.broadcast import BroadcastHub
+from app.services.response_cache import EncodedPayload
+
+
+class EventStream:
+    """
+    Luồng sự kiện cho /disasters/ws: client nhận snapshot đầy đủ 1 lần,
+    sau đó chỉ nhận delta (added / updated / removed) của mỗi chu kỳ ingest.
+    Mỗi frame được encode 1 lần rồi fan-out cho mọi client.
+    """
+
+    def __init__(self):
+        # Client chậm bị tràn hàng đợi sẽ được đồng bộ lại bằng snapshot
+        self.hub = BroadcastHub(maxsize=16)
+        self._snapshot = (None, None)
+
+    def snapshot_frame(self, version, store):
+        """Frame snapshot của store hiện tại (cache theo store, chỉ encode khi cần)"""
+        if self._snapshot[0] is not store:
+            frame = EncodedPayload.dumps({
+                "type": "snapshot", "version": version,
+                "count": len(store), "data": store.to_records()
+            }).decode("utf-8")
+            self._snapshot = (store, frame)
+        return self._snapshot[1]
+
+    def publish_delta(self, version, store, delta):
+        added, updated, removed = delta
+        if not len(self.hub): return
+        if not (len(added) or len(updated) or removed): return
+
+        records = store.to_records()
+        frame = EncodedPayload.dumps({
+            "type": "delta", "version": version,
+            "added": [records[i] for i in added.tolist()],
+            "updated": [records[i] for i in updated.tolist()],
+            "removed": removed
+        }).decode("utf-8")
+        self.hub.publish(frame)
+
+
+event_stream = EventStream()
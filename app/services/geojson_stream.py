@@ -0,0 +1,66 @@
+import codecs
+import json
+import re
+
+# Khóa mảng "features" của FeatureCollection (dấu " bên trong chuỗi JSON luôn bị escape,
+# nên mẫu này chỉ khớp với key thật)
+_FEATURES_KEY = re.compile(r'"features"\s*:\s*\[')
+_SEPARATORS = re.compile(r'[\s,]*')
+
+
+class GeoJSONFeatureStream:
+    """
+    Parser tăng dần (Incremental) cho mảng "features" của GeoJSON.
+    Nạp từng chunk bytes bằng feed(), nhận lại các Feature đã hoàn chỉnh.
+    Bộ nhớ chỉ giữ phần Feature đang dở dang, không phụ thuộc kích thước feed.
+    """
+
+    MAX_PENDING_CHARS = 8 * 1024 * 1024 # Chặn trên cho 1 Feature (chống dữ liệu hỏng)
+
+    def __init__(self):
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+        self._in_array = False
+        self.done = False
+
+    def feed(self, chunk: bytes) -> list:
+        """Nạp thêm bytes, trả về danh sách Feature (dict) parse được trong lượt này"""
+        if self.done: return []
+        self._buf += self._decoder.decode(chunk)
+
+        if not self._in_array:
+            match = _FEATURES_KEY.search(self._buf)
+            if match is None:
+                # Chưa tới mảng features: chỉ giữ lại phần đuôi để không cắt đôi từ khóa
+                self._buf = self._buf[-32:]
+                return []
+            self._buf = self._buf[match.end():]
+            self._in_array = True
+
+        features = []
+        buf, pos = self._buf, 0
+        while True:
+            pos = _SEPARATORS.match(buf, pos).end()
+            if pos >= len(buf): break
+            if buf[pos] == ']':
+                self.done = True
+                pos = len(buf)
+                break
+            try:
+                obj, pos_end = self._json.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                break # Feature chưa tải xong, chờ chunk tiếp theo
+            features.append(obj)
+            pos = pos_end
+
+        self._buf = buf[pos:]
+        if len(self._buf) > self.MAX_PENDING_CHARS:
+            raise ValueError("GeoJSON feature exceeds stream buffer limit")
+        return features
+
+    def close(self):
+        """Kết thúc stream, báo lỗi nếu body bị cắt ngang"""
+        self._decoder.decode(b"", final=True)
+        if not self.done:
+            raise ValueError("Truncated GeoJSON stream: 'features' array not closed")
@@ -0,0 +1,134 @@
+import asyncio
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+import httpx
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+
+from app.services.earthquake_service import DisasterService
+
+
+class IngestScheduler:
+    """
+    Bộ lập lịch ingest nền: mỗi nguồn có chu kỳ riêng, jitter ngẫu nhiên,
+    backoff lũy thừa khi lỗi / 429, và USGS tự tăng tốc khi có động đất lớn.
+    Mỗi job tự hẹn giờ lần chạy tiếp theo (DateTrigger) nên chu kỳ thay đổi được theo thời gian thực.
+    """
+
+    # Chu kỳ cơ bản (giây). DONKI DEMO_KEY chỉ cho ~50 request/ngày -> 30 phút/lần
+    SOURCES = {
+        "usgs":  {"interval": int(os.getenv("INGEST_USGS_INTERVAL", 60)),    "min": 15,  "max": 300},
+        "eonet": {"interval": int(os.getenv("INGEST_EONET_INTERVAL", 600)),  "min": 120, "max": 3600},
+        "solar": {"interval": int(os.getenv("INGEST_SOLAR_INTERVAL", 1800)), "min": 600, "max": 7200},
+    }
+    JITTER = 0.1 # ±10% để các node không gọi upstream cùng lúc
+    MAX_BACKOFF = 3600
+    # Chu kỳ train tiếp Deep Core (giây, 0 = tắt). Train tiếp chỉ học snapshot mới nên đủ rẻ để chạy định kỳ
+    DEEP_RETRAIN_INTERVAL = int(os.getenv("DEEP_RETRAIN_INTERVAL", 0))
+
+    def __init__(self):
+        self.scheduler = AsyncIOScheduler()
+        self.failures = {name: 0 for name in self.SOURCES}
+        self._inflight = {} # name -> task đang gọi upstream (single-flight)
+        self._retry_at = {name: 0.0 for name in self.SOURCES} # Mốc monotonic hết backoff
+
+    def start(self):
+        if self.scheduler.running: return
+        self.scheduler.start()
+        for name in self.SOURCES:
+            self._schedule(name, self._next_delay(name))
+        if self.DEEP_RETRAIN_INTERVAL > 0:
+            self.scheduler.add_job(
+                self._retrain_deep, "interval", seconds=self.DEEP_RETRAIN_INTERVAL,
+                id="retrain_deep", replace_existing=True, coalesce=True
+            )
+        print(f"⏱️ [SCHEDULER] Ingestion scheduler online: {', '.join(self.SOURCES)}")
+
+    def shutdown(self):
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=False)
+
+    def _schedule(self, name, delay):
+        self.scheduler.add_job(
+            self._run_source, "date", args=[name],
+            run_date=datetime.now() + timedelta(seconds=delay),
+            id=f"ingest_{name}", replace_existing=True, misfire_grace_time=30
+        )
+
+    def _adaptive_interval(self, name):
+        """USGS: động đất lớn gần đây -> poll nhanh hơn, yên tĩnh -> poll chậm lại"""
+        cfg = self.SOURCES[name]
+        interval = cfg["interval"]
+        if name == "usgs":
+            recent = DisasterService._source_sensors["usgs"]
+            max_mag = max((s["raw_val"] for s in recent), default=0.0)
+            if max_mag >= 6.0: interval *= 0.25
+            elif max_mag >= 5.0: interval *= 0.5
+            elif max_mag < 3.0: interval *= 2.0
+        return min(max(interval, cfg["min"]), cfg["max"])
+
+    def _next_delay(self, name, retry_after=None):
+        failures = self.failures[name]
+        if failures:
+            delay = min(self.SOURCES[name]["interval"] * (2 ** failures), self.MAX_BACKOFF)
+            if retry_after: delay = max(delay, retry_after)
+        else:
+            delay = self._adaptive_interval(name)
+        return delay * random.uniform(1 - self.JITTER, 1 + self.JITTER)
+
+    def run_now(self, name):
+        """
+        Chạy sớm 1 nguồn (vd: /realtime/usgs thấy dữ liệu cũ). Dùng chung lần chạy đang diễn ra;
+        đang trong thời gian backoff thì không gọi upstream. Trả về future hoàn tất khi xong.
+        """
+        task = self._inflight.get(name)
+        if task is None or task.done():
+            if time.monotonic() < self._retry_at[name]:
+                future = asyncio.get_running_loop().create_future()
+                future.set_result(None)
+                return future
+            task = asyncio.create_task(self._run_source(name))
+        return task
+
+    async def _run_source(self, name):
+        task = self._inflight.get(name)
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            return await asyncio.shield(task) # Lần chạy sớm đang diễn ra -> không gọi trùng
+        self._inflight[name] = asyncio.current_task()
+        retry_after = None
+        try:
+            changed = await DisasterService.refresh_source(name)
+            self.failures[name] = 0
+            if changed:
+                await DisasterService.publish()
+        except httpx.HTTPStatusError as e:
+            self.failures[name] += 1
+            if e.response.status_code == 429:
+                retry_after = self._parse_retry_after(e.response.headers.get("retry-after"))
+                print(f"⚠️ [SCHEDULER] {name} rate-limited (429). Backing off.")
+            else:
+                print(f"⚠️ [SCHEDULER] {name} HTTP {e.response.status_code}. Backing off.")
+        except Exception as e:
+            self.failures[name] += 1
+            print(f"⚠️ [SCHEDULER] {name} fetch failed: {e}")
+        finally:
+            delay = self._next_delay(name, retry_after)
+            self._retry_at[name] = time.monotonic() + delay if self.failures[name] else 0.0
+            self._schedule(name, delay)
+
+    async def _retrain_deep(self):
+        from app.services.training_jobs import training_jobs
+        # Job cùng loại đang chạy thì submit() trả về job đó, không xếp thêm
+        training_jobs.submit("deep")
+
+    @staticmethod
+    def _parse_retry_after(value):
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+
+ingest_scheduler = IngestScheduler()
@@ -0,0 +1,75 @@
+import gzip
+import hashlib
+import json
+from fastapi import Request, Response
+
+# Thư viện tăng tốc (tùy chọn): có thì dùng, không có thì fallback thư viện chuẩn
+try:
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class EncodedPayload:
+    """
+    Response JSON đã serialize + nén sẵn (identity / gzip / br) kèm ETag mạnh.
+    Được dựng 1 lần mỗi chu kỳ ingest, endpoint chỉ việc trả bytes.
+    """
+
+    def __init__(self, version, body: bytes):
+        self.version = version
+        self.variants = {"identity": body, "gzip": gzip.compress(body, compresslevel=6)}
+        if brotli is not None:
+            self.variants["br"] = brotli.compress(body, quality=5)
+        digest = hashlib.blake2b(body, digest_size=8).hexdigest()
+        self.etag = f'"{version}-{digest}"'
+
+    @classmethod
+    def build(cls, version, obj):
+        return cls(version, cls.dumps(obj))
+
+    @staticmethod
+    def dumps(obj) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    def _variant_etag(self, encoding):
+        return self.etag if encoding == "identity" else f'{self.etag[:-1]}-{encoding}"'
+
+    def _pick_encoding(self, accept_encoding):
+        accepted = {}
+        for part in (accept_encoding or "").lower().split(","):
+            name, _, params = part.strip().partition(";")
+            q = 1.0
+            if params.strip().startswith("q="):
+                try: q = float(params.strip()[2:])
+                except ValueError: q = 0.0
+            if name: accepted[name] = q
+        for encoding in ("br", "gzip"):
+            if encoding in self.variants and accepted.get(encoding, accepted.get("*", 0.0)) > 0:
+                return encoding
+        return "identity"
+
+    def _not_modified(self, if_none_match):
+        if not if_none_match: return False
+        tags = {t.strip().removeprefix("W/") for t in if_none_match.split(",")}
+        return "*" in tags or any(self._variant_etag(e) in tags for e in self.variants)
+
+    def response(self, request: Request) -> Response:
+        """Trả về 304 nếu client đã có bản này, ngược lại trả bytes đã nén phù hợp"""
+        encoding = self._pick_encoding(request.headers.get("accept-encoding"))
+        headers = {
+            "ETag": self._variant_etag(encoding),
+            "Vary": "Accept-Encoding",
+            "Cache-Control": "no-cache",
+        }
+        if self._not_modified(request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(content=self.variants[encoding], media_type="application/json", headers=headers)
@@ -0,0 +1,134 @@
+import asyncio
+from datetime import datetime, timezone
+from pymongo import InsertOne, UpdateOne
+
+from app.core.database import Database
+from app.models.features import feature_doc
+
+
+class SnapshotWriter:
+    """
+    Write-Behind cho MongoDB: chu kỳ ingest chỉ đẩy snapshot vào hàng đợi (không chặn),
+    worker nền gom batch và ghi bằng bulk_write trong thread riêng.
+
+    - Collection 'events': 1 document / sự kiện (_id = mã nguồn), chỉ upsert khi dữ liệu đổi.
+    - Collection 'raw_logs': 1 bản tóm tắt nhỏ / chu kỳ (giữ định dạng cho các lõi AI).
+    - Collection 'feature_store': đặc trưng đã tính sẵn / chu kỳ (vector toàn cầu + dòng trạm) cho training.
+    """
+
+    QUEUE_SIZE = 16
+    MAX_BATCH = 8
+    SAMPLE_SIZE = 20 # Số trạm mẫu lưu trong raw_logs (GuardianAI chỉ học 20 trạm/log)
+
+    def __init__(self):
+        self._queue = None
+        self._worker = None
+        # Trạng thái đã ghi gần nhất của từng sự kiện (chỉ giữ các sự kiện đang hoạt động)
+        self._last_written = {}
+
+    def start(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue(maxsize=self.QUEUE_SIZE)
+            self._worker = asyncio.create_task(self._run())
+
+    def submit(self, store, features=None):
+        """Đưa snapshot vào hàng đợi. Nếu đầy thì bỏ snapshot cũ nhất (dữ liệu mới thay thế)."""
+        if Database.db is None: return
+        self.start()
+        item = (datetime.now(timezone.utc), store, features)
+        if self._queue.full():
+            self._queue.get_nowait()
+            print("⚠️ [DB WRITER] Queue full, dropping oldest snapshot.")
+        self._queue.put_nowait(item)
+
+    async def stop(self):
+        """Flush toàn bộ hàng đợi rồi dừng worker (gọi khi tắt server)"""
+        if self._worker is None: return
+        pending = self._queue.qsize()
+        await self._queue.put(None) # Sentinel: worker ghi nốt các snapshot phía trước rồi thoát
+        await self._worker
+        self._worker = None
+        print(f"💾 [DB WRITER] Flushed {pending} pending snapshot(s) on shutdown.")
+
+    async def _run(self):
+        running = True
+        while running:
+            batch = []
+            item = await self._queue.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.MAX_BATCH or self._queue.empty(): break
+                item = self._queue.get_nowait()
+            running = item is not None
+
+            if not batch: continue
+            try:
+                await asyncio.to_thread(self._flush, batch)
+            except Exception as e:
+                print(f"⚠️ [DB SAVE ERROR] Could not save to MongoDB: {e}")
+
+    @staticmethod
+    def _diff(previous, timestamp, records):
+        """So sánh với trạng thái trước, trả về (danh sách UpdateOne cho sự kiện mới/đổi/mất, trạng thái mới)"""
+        ops = []
+        current = {}
+        for r in records:
+            event_id = r.get("id")
+            if not event_id: continue
+            state = (r["type"], r["place"], r["lat"], r["lon"], r["energy_level"], r["anomaly_score"], r["raw_val"])
+            current[event_id] = state
+            if previous.get(event_id) != state:
+                fields = {k: v for k, v in r.items() if k != "id"}
+                fields.update({"active": True, "updated_at": timestamp})
+                ops.append(UpdateOne(
+                    {"_id": event_id},
+                    {"$set": fields, "$setOnInsert": {"first_seen": timestamp}},
+                    upsert=True
+                ))
+
+        for event_id in previous.keys() - current.keys():
+            ops.append(UpdateOne({"_id": event_id}, {"$set": {"active": False, "updated_at": timestamp}}))
+
+        return ops, current
+
+    def _flush(self, batch):
+        """Chạy trong thread: tính diff và ghi bulk (không chặn event loop)"""
+        events = Database.get_collection("events")
+        logs = Database.get_collection("raw_logs")
+        feature_store = Database.get_collection("feature_store")
+        if events is None or logs is None: return
+
+        event_ops = []
+        log_ops = []
+        feature_ops = []
+        written = self._last_written
+        for timestamp, store, features in batch:
+            records = store.to_records()
+            changed, written = self._diff(written, timestamp, records)
+            event_ops.extend(changed)
+
+            summary = {
+                "timestamp": timestamp,
+                "total_events": len(store),
+                "max_magnitude": store.max("raw_val"),
+                "changed_events": len(changed),
+                "sensors_data": records[:self.SAMPLE_SIZE]
+            }
+            if features is not None:
+                summary["features"] = [float(x) for x in features]
+            log_ops.append(InsertOne(summary))
+            feature_ops.append(InsertOne(
+                feature_doc(timestamp, store, store.select(slice(0, self.SAMPLE_SIZE)), features)
+            ))
+
+        if event_ops:
+            # ordered=True: giữ đúng thứ tự thay đổi giữa các snapshot trong cùng batch
+            events.bulk_write(event_ops, ordered=True)
+        # Chỉ ghi nhận trạng thái sau khi ghi thành công: lỗi -> batch sau diff lại từ trạng thái cũ
+        self._last_written = written
+        logs.bulk_write(log_ops, ordered=False)
+        if feature_store is not None:
+            feature_store.bulk_write(feature_ops, ordered=False)
+
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,155 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+# --- HÀM HUẤN LUYỆN (chạy trong process con) ---
+def _train_deep():
+    """Train tiếp (hoặc từ đầu) LSTM rồi ghi checkpoint; process cha nạp lại checkpoint để swap"""
+    from app.upt_engine.deep_core import DeepGuardian
+    return {"samples": DeepGuardian().train_online()}
+
+
+_TRAINERS = {"deep": _train_deep}
+_events = None # Hàng đợi báo sự kiện về process cha (gán trong process con)
+
+
+def _init_worker(events):
+    global _events
+    _events = events
+
+
+def _run_job(job_id, kind):
+    """Chạy trong process con: báo thời điểm bắt đầu thật rồi mới train"""
+    _events.put((job_id, time.time()))
+    return _TRAINERS[kind]()
+
+
+class TrainingJobs:
+    """
+    Huấn luyện AI dạng job: chạy trong process pool (không chặn event loop / GIL),
+    mỗi job có id + trạng thái để client poll. Khi xong, model + scaler mới được
+    thay vào bộ não đang phục vụ trong 1 bước trên event loop; trước đó mọi dự báo
+    vẫn dùng model cũ.
+    """
+
+    KINDS = tuple(_TRAINERS)
+    MAX_HISTORY = 50 # Số job đã xong còn giữ để tra cứu
+
+    def __init__(self):
+        self._pool = None
+        self._events = None
+        self.jobs = OrderedDict()
+        self._active = {} # kind -> job id đang chờ/chạy (không xếp 2 job cùng loại)
+
+    def _get_pool(self):
+        if self._pool is None:
+            # spawn: TensorFlow không an toàn khi fork từ process đã có thread
+            ctx = multiprocessing.get_context("spawn")
+            self._events = ctx.SimpleQueue()
+            self._pool = ProcessPoolExecutor(max_workers=1, mp_context=ctx,
+                                             initializer=_init_worker, initargs=(self._events,))
+            # Thread đọc sự kiện "bắt đầu" từ process con, cập nhật job trên event loop
+            loop = asyncio.get_running_loop()
+            threading.Thread(target=self._read_events, args=(self._events, loop),
+                             name="training-events", daemon=True).start()
+        return self._pool
+
+    def _read_events(self, events, loop):
+        while True:
+            event = events.get()
+            if event is None: return
+            loop.call_soon_threadsafe(self._mark_started, *event)
+
+    def _mark_started(self, job_id, started_at):
+        job = self.jobs.get(job_id)
+        if job is None: return
+        job["started_at"] = job["started_at"] or started_at
+        if job["status"] == "queued":
+            job["status"] = "running"
+
+    def _reset_pool(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+        if self._events is not None:
+            self._events.put(None) # Dừng thread đọc sự kiện
+            self._events = None
+
+    def submit(self, kind="deep"):
+        """Đưa job vào hàng đợi (gọi trên event loop). Trả về job hiện có nếu loại này đang chạy."""
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown training job kind: {kind}")
+        if kind in self._active:
+            return self.get(self._active[kind])
+
+        job = {
+            "id": uuid.uuid4().hex[:12],
+            "kind": kind,
+            "status": "queued",
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "samples": None,
+            "error": None,
+        }
+        self.jobs[job["id"]] = job
+        self._active[kind] = job["id"]
+        while len(self.jobs) > self.MAX_HISTORY:
+            oldest = next(iter(self.jobs))
+            if oldest in self._active.values(): break
+            del self.jobs[oldest]
+
+        future = self._get_pool().submit(_run_job, job["id"], kind)
+        asyncio.create_task(self._watch(job, future))
+        print(f"🧪 [TRAINING] Job {job['id']} ({kind}) queued")
+        return self._public(job)
+
+    def get(self, job_id):
+        job = self.jobs.get(job_id)
+        return self._public(job) if job else None
+
+    def list(self):
+        return [self._public(j) for j in reversed(self.jobs.values())]
+
+    def _public(self, job):
+        return dict(job)
+
+    async def _watch(self, job, future):
+        try:
+            result = await asyncio.wrap_future(future)
+            job["samples"] = result["samples"]
+            if result["samples"]:
+                job["status"] = "swapping"
+                await self._swap(job["kind"], result)
+            job["status"] = "succeeded"
+            print(f"✅ [TRAINING] Job {job['id']} ({job['kind']}) done: {result['samples']} samples")
+        except Exception as e:
+            if isinstance(e, BrokenProcessPool):
+                self._reset_pool() # Process con chết (vd: OOM) -> job sau dựng pool mới
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"⚠️ [TRAINING] Job {job['id']} ({job['kind']}) failed: {e}")
+        finally:
+            job["finished_at"] = time.time()
+            if self._active.get(job["kind"]) == job["id"]:
+                del self._active[job["kind"]]
+
+    async def _swap(self, kind, result):
+        from app.upt_engine.deep_core import guardian_brain
+        # Đọc checkpoint (NumpyLSTM + scaler) ngoài event loop, swap trên event loop
+        checkpoint = await asyncio.to_thread(guardian_brain.load_checkpoint_files)
+        if checkpoint is None:
+            raise RuntimeError("trained checkpoint could not be loaded")
+        guardian_brain.swap(*checkpoint)
+
+    def shutdown(self):
+        self._reset_pool()
+
+
+training_jobs = TrainingJobs()
@@ -0,0 +1,103 @@
+import asyncio
+import json
+import os
+import time
+
+from app.services.response_cache import EncodedPayload
+
+# Thư viện tăng tốc (tùy chọn): có thì dùng, không có thì fallback thư viện chuẩn
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class WorkerSync:
+    """
+    Đồng bộ dữ liệu ingest giữa các worker khi chạy REACTOR_MODE=shared.
+    Chỉ worker chính gọi upstream; sau mỗi lần publish nó ghi dữ liệu nguồn ra 1 file chung
+    (ghi file tạm rồi os.replace). Follower theo dõi file đó và checkpoint của Deep Core,
+    publish lại cục bộ (cache, WebSocket, AI) mà không gửi cảnh báo / ghi DB / tác động lò.
+    """
+
+    SNAPSHOT_FILE = os.getenv("INGEST_SHARE_FILE", "/tmp/upt_ingest_snapshot.json")
+    POLL_INTERVAL = 1.0         # Giây giữa 2 lần follower kiểm tra file snapshot
+    CHECKPOINT_INTERVAL = 30.0  # Giây giữa 2 lần follower kiểm tra checkpoint mới
+
+    def __init__(self):
+        self.generation = None
+        self._task = None
+        self._mtime = None
+
+    @property
+    def enabled(self):
+        return self.generation is not None
+
+    def configure(self, generation):
+        """Bật đồng bộ (chế độ shared): generation phân biệt lần chạy, file của lần chạy cũ bị bỏ qua"""
+        self.generation = generation
+
+    # --- WORKER CHÍNH ---
+    async def export(self, sources):
+        if not self.enabled: return
+        data = {"generation": self.generation, "sources": sources}
+        try:
+            await asyncio.to_thread(self._write, EncodedPayload.dumps(data))
+        except OSError as e:
+            print(f"⚠️ [WORKER SYNC] Could not export ingest snapshot: {e}")
+
+    def _write(self, body):
+        tmp = f"{self.SNAPSHOT_FILE}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(body)
+        os.replace(tmp, self.SNAPSHOT_FILE)
+
+    # --- FOLLOWER ---
+    def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._follow())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _read(self):
+        """Trả về dữ liệu nguồn nếu file đổi kể từ lần đọc trước (và thuộc lần chạy hiện tại)"""
+        try:
+            mtime = os.stat(self.SNAPSHOT_FILE).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._mtime: return None
+        self._mtime = mtime
+        with open(self.SNAPSHOT_FILE, "rb") as f:
+            body = f.read()
+        data = orjson.loads(body) if orjson is not None else json.loads(body)
+        if data.get("generation") != self.generation: return None
+        return data["sources"]
+
+    async def _follow(self):
+        from app.services.earthquake_service import DisasterService
+        from app.upt_engine.deep_core import guardian_brain
+
+        next_checkpoint = 0.0
+        while True:
+            try:
+                sources = await asyncio.to_thread(self._read)
+                if sources is not None:
+                    await DisasterService.apply_shared_sources(sources)
+                if time.monotonic() >= next_checkpoint:
+                    next_checkpoint = time.monotonic() + self.CHECKPOINT_INTERVAL
+                    await guardian_brain.reload_checkpoint()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ [WORKER SYNC] Sync failed: {e}")
+            await asyncio.sleep(self.POLL_INTERVAL)
+
+
+worker_sync = WorkerSync()
@@ -244,7 +244,8 @@ async function fetchAllDataLoop() {
 
   let nextDelay = 60000;
   try {
-    const response = await fetch(`/api/v1/disasters/live?t=${Date.now()}`);
+    // Không thêm ?t= để trình duyệt tự xác thực lại bằng ETag (304 khi dữ liệu chưa đổi)
+    const response = await fetch("/api/v1/disasters/live", { cache: "no-cache" });
     const json = await response.json();
 
     if (json.data && json.data.length > 0) {
@@ -264,12 +265,47 @@ async function fetchAllDataLoop() {
     nextDelay = 5000;
   }
 
-  if (isLive) {
+  // Đang có luồng delta WebSocket thì không cần polling tiếp
+  if (isLive && !disasterSocket) {
     clearTimeout(fetchTimer);
     fetchTimer = setTimeout(fetchAllDataLoop, nextDelay);
   }
 }
 
+// 4b. Disaster Delta Stream: nhận snapshot đầy đủ 1 lần, sau đó chỉ nhận thay đổi
+let disasterSocket = null;
+let disasterEvents = new Map();
+let disasterVersion = 0;
+
+function connectDisasterStream() {
+  const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
+  disasterSocket = new WebSocket(
+    `${protocol}//${window.location.host}/api/v1/disasters/ws`
+  );
+  disasterSocket.onmessage = (event) => {
+    try {
+      const msg = JSON.parse(event.data);
+      if (msg.type === "snapshot") {
+        disasterEvents = new Map(msg.data.map((e) => [e.id, e]));
+        disasterVersion = msg.version;
+        if (disasterEvents.size > 0) trainModel();
+      } else if (msg.type === "delta") {
+        if (msg.version <= disasterVersion) return; // Đã có trong snapshot
+        msg.removed.forEach((id) => disasterEvents.delete(id));
+        msg.added.concat(msg.updated).forEach((e) => disasterEvents.set(e.id, e));
+        disasterVersion = msg.version;
+      }
+      if (disasterEvents.size > 0)
+        processBackendData(Array.from(disasterEvents.values()));
+    } catch (e) {}
+  };
+  disasterSocket.onclose = () => {
+    disasterSocket = null;
+    // Mất luồng delta -> quay về polling
+    if (isLive) fetchAllDataLoop();
+  };
+}
+
 function processBackendData(events) {
   let combinedEvents = [];
   let counts = { QUAKE: 0, FIRE: 0, VOLCANO: 0, STORM: 0, ICE: 0, OTHER: 0 };
@@ -748,7 +784,7 @@ document.getElementById("btn-link").addEventListener("click", () => {
     btn.innerText = "LINK ESTABLISHED";
     printTerm("Initializing Quantum Uplink (WebSocket)...");
     window.sfx.playBeep();
-    fetchAllDataLoop();
+    connectDisasterStream();
     const protocol = window.location.protocol === "https:" ? "wss:" : "ws:";
     const wsUrl = `${protocol}//${window.location.host}/api/v1/reactor/ws/status`;
 
@@ -778,6 +814,7 @@ document.getElementById("btn-link").addEventListener("click", () => {
     btn.innerText = "ACTIVATE REACTOR LINK";
     clearTimeout(fetchTimer);
     if (socket) socket.close();
+    if (disasterSocket) disasterSocket.close();
     printTerm("Uplink Terminated.");
     document.getElementById("status-model").innerText = "OFFLINE";
   }
@@ -1,32 +1,190 @@
+import asyncio
+import json
+import os
+import threading
+from datetime import datetime
 import numpy as np
-import tensorflow as tf
+import joblib
 from sklearn.preprocessing import MinMaxScaler
 from collections import deque
 from app.core.database import Database
+from app.models.event_store import EventStore
+from app.models.features import merged_history
+from app.upt_engine.numpy_lstm import NumpyLSTM
+
+# TensorFlow chỉ cần cho việc train (process của training job); phục vụ dùng NumpyLSTM
+tf = None
+
+# Khoảng giá trị cố định của 5 đặc trưng (EventStore.global_features đã chuẩn hóa về [0, 1]).
+# Scaler không fit lại theo dữ liệu -> cửa sổ cũ vẫn hợp lệ khi train tiếp (continual learning).
+FEATURE_MIN = [0.0, 0.0, 0.0, 0.0, 0.0]
+FEATURE_MAX = [1.0, 1.0, 1.0, 1.0, 1.0]
+
+FULL_HISTORY_LIMIT = 1000    # Số snapshot khi train lại từ đầu
+INCREMENTAL_LIMIT = 50_000   # Số snapshot mới tối đa mỗi lần train tiếp
+INCREMENTAL_BATCH = 64
+
+def _fixed_scaler():
+    scaler = MinMaxScaler(feature_range=(0, 1), clip=True)
+    scaler.fit(np.array([FEATURE_MIN, FEATURE_MAX]))
+    return scaler
+
+def _load_tf():
+    global tf
+    if tf is None:
+        import tensorflow
+        tf = tensorflow
+    return tf
 
 class DeepGuardian:
     def __init__(self):
         self.model_path = "app/upt_engine/guardian_lstm.keras"
-        self.scaler = MinMaxScaler(feature_range=(0, 1))
+        self.weights_path = "app/upt_engine/guardian_lstm.npz" # Trọng số xuất cho NumpyLSTM
+        self.scaler_path = "app/upt_engine/guardian_scaler.joblib"
+        self.meta_path = "app/upt_engine/guardian_lstm.meta.json"
+        self.scaler = _fixed_scaler()
+        # Timestamp snapshot mới nhất model đã học (high-water mark cho train tiếp)
+        self.high_water = None
         self.look_back = 5 
         self.is_trained = False
         self.model = None
         
         # Buffer lưu trữ trạng thái TOÀN CẦU thực tế (được cập nhật bởi EarthquakeService)
         self.realtime_buffer = deque(maxlen=self.look_back)
-        
+        # Phiên bản buffer + kết quả LSTM cho phiên bản đó (chỉ đổi mỗi chu kỳ ingest)
+        self.buffer_version = 0
+        self.global_instability = None
+        self._instability_version = -1
+
+        # Khởi tạo nặng (TF + checkpoint / train) chạy nền, gọi start() lúc startup
+        self.is_ready = False
+        self._init_thread = None
+        self._checkpoint_mtime = None # mtime của file trọng số đang phục vụ
+
+    def start(self):
+        """Khởi tạo bộ não ở thread nền. Trong lúc chờ, predict_risk dùng công thức fallback."""
+        if self._init_thread is None:
+            self._loop = asyncio.get_running_loop()
+            self._init_thread = threading.Thread(target=self._initialize, name="deep-core-init", daemon=True)
+            self._init_thread.start()
+
+    def _initialize(self):
+        checkpoint = None
+        try:
+            checkpoint = self.load_checkpoint_files()
+            if checkpoint:
+                print(f"🧠 [DEEP CORE] Restored LSTM checkpoint from {self.weights_path} (NumPy inference)")
+        except Exception as e:
+            print(f"⚠️ [DEEP CORE] Initialization failed, staying on fallback formulas: {e}")
+        finally:
+            try:
+                self._loop.call_soon_threadsafe(self._finish_initialize, checkpoint)
+            except RuntimeError:
+                pass # Event loop đã đóng (server tắt trong lúc khởi tạo)
+
+    def _finish_initialize(self, checkpoint):
+        """Chạy trên event loop: swap checkpoint rồi mới báo sẵn sàng (không lộ trạng thái nửa vời)"""
+        if checkpoint:
+            self.swap(*checkpoint)
+        self.is_ready = True
+
+    async def train_if_missing(self):
+        """Chỉ worker chính gọi: chưa có checkpoint -> train trong process pool, xong sẽ tự swap vào"""
+        if self._init_thread is not None:
+            await asyncio.to_thread(self._init_thread.join)
+        if self.is_trained or Database.db is None: return
+        print("🧠 [DEEP CORE] Loading REAL Memory Patterns from DB...")
+        from app.services.training_jobs import training_jobs
+        training_jobs.submit("deep")
+
+    async def reload_checkpoint(self):
+        """Follower: nạp checkpoint do worker chính train ra (khi file trọng số đổi)"""
+        try:
+            mtime = os.stat(self.weights_path).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._checkpoint_mtime: return False
+        checkpoint = await asyncio.to_thread(self.load_checkpoint_files)
+        if checkpoint is None: return False
+        self.swap(*checkpoint)
+        print(f"🧠 [DEEP CORE] Reloaded LSTM checkpoint from {self.weights_path}")
+        return True
+
+    def load_checkpoint_files(self):
+        """
+        Đọc model phục vụ (NumpyLSTM) + scaler đã lưu. Trả về (model, scaler) hoặc None.
+        Không cần TensorFlow, trừ khi chỉ có checkpoint .keras cũ (xuất trọng số 1 lần).
+        """
+        if not os.path.exists(self.scaler_path):
+            return None
+        try:
+            if os.path.exists(self.weights_path):
+                self._checkpoint_mtime = os.stat(self.weights_path).st_mtime_ns
+                model = NumpyLSTM.load(self.weights_path)
+            elif os.path.exists(self.model_path):
+                _load_tf()
+                model = NumpyLSTM.from_keras(tf.keras.models.load_model(self.model_path))
+                model.save(self.weights_path)
+                self._checkpoint_mtime = os.stat(self.weights_path).st_mtime_ns
+            else:
+                return None
+            return model, joblib.load(self.scaler_path)
+        except Exception as e:
+            print(f"⚠️ [DEEP CORE] Checkpoint unreadable: {e}")
+            return None
+
+    def _save_checkpoint(self):
+        """Ghi ra file tạm rồi os.replace: không bao giờ để lại checkpoint ghi dở"""
+        model_tmp = self.model_path.replace(".keras", ".tmp.keras")
+        weights_tmp = self.weights_path + ".tmp"
+        scaler_tmp = self.scaler_path + ".tmp"
+        try:
+            self.model.save(model_tmp)
+            NumpyLSTM.from_keras(self.model).save(weights_tmp)
+            joblib.dump(self.scaler, scaler_tmp)
+            os.replace(model_tmp, self.model_path)
+            os.replace(weights_tmp, self.weights_path)
+            os.replace(scaler_tmp, self.scaler_path)
+            meta = {"scaler": "fixed", "high_water": self.high_water.isoformat() if self.high_water else None}
+            with open(self.meta_path + ".tmp", "w") as f:
+                json.dump(meta, f)
+            os.replace(self.meta_path + ".tmp", self.meta_path)
+        except Exception as e:
+            print(f"⚠️ [DEEP CORE] Could not save checkpoint: {e}")
+
+    def _restore_for_training(self):
+        """Nạp model Keras (kèm trạng thái optimizer) + high-water để train tiếp. False nếu phải train lại từ đầu."""
+        if not (os.path.exists(self.model_path) and os.path.exists(self.meta_path)):
+            return False
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+            # Checkpoint dùng scaler fit theo dữ liệu (bản cũ) không train tiếp được với scaler cố định
+            if meta.get("scaler") != "fixed" or not meta.get("high_water"):
+                return False
+            _load_tf()
+            self.model = tf.keras.models.load_model(self.model_path)
+            self.high_water = datetime.fromisoformat(meta["high_water"])
+            return True
+        except Exception as e:
+            print(f"⚠️ [DEEP CORE] Cannot resume from checkpoint, retraining from scratch: {e}")
+            return False
+
+    def swap(self, model, scaler):
+        """Thay model + scaler đang phục vụ trong 1 bước (gọi trên event loop)"""
+        instability = self._compute_instability(model, scaler)
+        self.model, self.scaler = model, scaler
+        self.global_instability = instability
+        self._instability_version = self.buffer_version
+        self.is_trained = True
+
+    def _build_brain(self):
+        _load_tf()
         # Config TF
         gpus = tf.config.list_physical_devices('GPU')
         if gpus: print(f"🚀 [DEEP CORE] NVIDIA GPU Active: {len(gpus)} device(s).")
         else: print("⚠️ [DEEP CORE] Running on CPU Mode.")
 
-        self._build_brain()
-        
-        if Database.db is not None:
-            print("🧠 [DEEP CORE] Loading REAL Memory Patterns from DB...")
-            self.train_from_memory()
-        
-    def _build_brain(self):
         self.model = tf.keras.models.Sequential()
         self.model.add(tf.keras.layers.Input(shape=(self.look_back, 5)))
         
@@ -40,59 +198,118 @@ class DeepGuardian:
         self.model.compile(optimizer='adam', loss='binary_crossentropy')
 
     def _extract_features(self, sensors):
-        """Hàm helper để trích xuất 5 chỉ số thực từ danh sách sensors"""
-        if not sensors: return [0,0,0,0,0]
-        
-        avg_energy = np.mean([s.get('energy_level', 0) for s in sensors])
-        avg_anomaly = np.mean([s.get('anomaly_score', 0) for s in sensors])
-        max_mag = max([s.get('raw_val', 0) for s in sensors])
-        
-        # Normalize event count (Giả sử 200 event là mốc cao)
-        event_count_norm = min(len(sensors) / 200.0, 1.0)
-        
-        # Lấy năng lượng vũ trụ (Solar Flare)
-        cosmic_energy = 0.0
-        for s in sensors:
-            if s.get('type') == 'SOLAR_FLARE':
-                cosmic_energy = max(cosmic_energy, s.get('energy_level', 0))
-                
+        """Hàm helper để trích xuất 5 chỉ số thực từ danh sách sensors (list dict hoặc EventStore)"""
+        if not isinstance(sensors, EventStore):
+            sensors = EventStore.from_sensors(sensors)
         # Vector 5 chiều THỰC TẾ
-        return [avg_energy, avg_anomaly, max_mag/10.0, event_count_norm, cosmic_energy]
+        return sensors.global_features()
+
+    def _query_features(self, query, direction, limit):
+        """
+        [(timestamp, vector 5 chiều)] - chỉ đọc các trường cần (projection).
+        feature_store, bù raw_logs cũ cho các snapshot chưa có trong feature_store.
+        """
+        docs = merged_history(
+            Database.get_collection("feature_store"), Database.get_collection("raw_logs"),
+            query, direction, limit,
+            {"_id": 0, "timestamp": 1, "features": 1},
+            {"timestamp": 1, "features": 1, "sensors_data": 1},
+        )
+        rows = []
+        for _, doc in docs:
+            # Snapshot mới lưu sẵn vector đặc trưng; snapshot cũ thì tính lại từ sensors_data
+            features = doc.get('features')
+            if features is None:
+                features = self._extract_features(doc.get('sensors_data', []))
+            rows.append((doc.get('timestamp'), features))
+        return rows
+
+    def _windows(self, features, start):
+        """Cửa sổ (look_back, 5) kết thúc trước từng vị trí i >= start, target = max_mag của bước i"""
+        data = self.scaler.transform(np.array(features, dtype=np.float64))
+        start = max(start, self.look_back)
+        windows = np.lib.stride_tricks.sliding_window_view(data, (self.look_back, 5))[:, 0]
+        # Target: Dự đoán MaxMag tiếp theo (hoặc mức độ bất ổn)
+        return np.ascontiguousarray(windows[start - self.look_back:len(data) - self.look_back]), data[start:, 2]
 
     def train_from_memory(self):
-        col = Database.get_collection("raw_logs")
-        if col is None: return 0
-        
-        try: logs = list(col.find().sort("timestamp", 1).limit(1000))
+        """Train lại từ đầu trên lịch sử gần đây"""
+        try: rows = self._query_features({}, 1, FULL_HISTORY_LIMIT)
         except: return 0
         
-        if len(logs) < self.look_back + 10: return 0
-        
-        data = []
-        for log in logs:
-            sensors = log.get('sensors_data', [])
-            features = self._extract_features(sensors)
-            data.append(features)
-
-        dataset = np.array(data)
-        self.scaler.fit(dataset) # Fit scaler với dữ liệu thật
-        dataset_scaled = self.scaler.transform(dataset)
-        
-        X, y = [], []
-        for i in range(self.look_back, len(dataset_scaled)):
-            X.append(dataset_scaled[i-self.look_back:i, :])
-            # Target: Dự đoán MaxMag tiếp theo (hoặc mức độ bất ổn)
-            y.append(dataset_scaled[i, 2]) 
-            
-        self.model.fit(np.array(X), np.array(y), epochs=3, batch_size=4, verbose=0)
+        if len(rows) < self.look_back + 10: return 0
+
+        X, y = self._windows([f for _, f in rows], self.look_back)
+        self.model.fit(X, y, epochs=3, batch_size=4, verbose=0)
+        self.high_water = rows[-1][0]
         self.is_trained = True
+        self._refresh_instability(force=True) # Model mới -> tính lại cho buffer hiện tại
         return len(X)
 
+    def train_incremental(self):
+        """
+        Train tiếp trọng số hiện có chỉ với các snapshot mới hơn high-water
+        (kèm look_back snapshot trước đó làm ngữ cảnh cho cửa sổ đầu tiên).
+        """
+        try:
+            context = self._query_features({"timestamp": {"$lte": self.high_water}}, -1, self.look_back)[::-1]
+            fresh = self._query_features({"timestamp": {"$gt": self.high_water}}, 1, INCREMENTAL_LIMIT)
+        except Exception as e:
+            print(f"⚠️ DB Read Error: {e}")
+            return 0
+
+        rows = context + fresh
+        if not fresh or len(rows) <= self.look_back: return 0
+
+        X, y = self._windows([f for _, f in rows], len(context))
+        if len(X) == 0: return 0
+        self.model.fit(X, y, epochs=1, batch_size=INCREMENTAL_BATCH, verbose=0)
+        self.high_water = fresh[-1][0]
+        self.is_trained = True
+        return len(X)
+
+    def train_online(self):
+        """Entry point của training job: train tiếp nếu có checkpoint hợp lệ, không thì train từ đầu"""
+        if self._restore_for_training():
+            samples = self.train_incremental()
+        else:
+            self._build_brain()
+            samples = self.train_from_memory()
+        if samples:
+            self._save_checkpoint()
+        return samples
+
     def update_realtime_state(self, sensors):
         """Được gọi bởi EarthquakeService mỗi khi có dữ liệu mới"""
         features = self._extract_features(sensors)
         self.realtime_buffer.append(features)
+        self.buffer_version += 1
         # print(f"🧠 [AI MEMORY] Buffer updated with REAL state: {features}")
+        self._refresh_instability()
+        return features
+
+    def _refresh_instability(self, force=False):
+        """Chạy LSTM 1 lần cho mỗi phiên bản buffer, predict_risk chỉ đọc lại kết quả"""
+        if not force and self._instability_version == self.buffer_version: return
+        self._instability_version = self.buffer_version
+        self.global_instability = None
+        if not self.is_trained: return
+        self.global_instability = self._compute_instability(self.model, self.scaler)
+
+    def _compute_instability(self, model, scaler):
+        if len(self.realtime_buffer) < self.look_back: return None
+        try:
+            # 1. Lấy bối cảnh toàn cầu từ Buffer (REAL DATA)
+            raw_seq = np.array(list(self.realtime_buffer))
+            seq_scaled = scaler.transform(raw_seq)
+            input_reshaped = np.reshape(seq_scaled, (1, self.look_back, 5))
+
+            # 2. AI dự đoán mức độ bất ổn toàn cầu (0.0 - 1.0)
+            # Gọi model trực tiếp (NumpyLSTM hoặc Keras cùng dạng gọi), không qua model.predict()
+            return float(model(input_reshaped, training=False)[0][0])
+        except Exception as e:
+            print(f"LSTM Error: {e}")
+            return None
 
     def learn(self, sensors):
         return self.update_realtime_state(sensors)
@@ -108,24 +325,31 @@ class DeepGuardian:
         if not self.is_trained:
             return (local_energy + local_anomaly) / 2.0
 
-        try:
-            # 1. Lấy bối cảnh toàn cầu từ Buffer (REAL DATA)
-            raw_seq = np.array(list(self.realtime_buffer))
-            seq_scaled = self.scaler.transform(raw_seq)
-            input_reshaped = np.reshape(seq_scaled, (1, self.look_back, 5))
-            
-            # 2. AI dự đoán mức độ bất ổn toàn cầu (0.0 - 1.0)
-            global_instability = float(self.model.predict(input_reshaped, verbose=0)[0][0])
-            
-            # 3. Kết hợp với dữ liệu cục bộ (Local Context)
-            # Công thức: Risk = Global_Instability * (1 + Local_Energy)
-            # Ý nghĩa: Nếu thế giới bất ổn, một chấn động nhỏ ở địa phương cũng có thể gây sụp đổ
-            final_risk = global_instability * (0.5 + local_energy)
-            
-            return min(final_risk, 1.0)
-            
-        except Exception as e:
-            print(f"LSTM Error: {e}")
+        # Bất ổn toàn cầu đã được LSTM tính sẵn khi buffer cập nhật
+        global_instability = self.global_instability
+        if global_instability is None:
             return 0.5
 
+        # Kết hợp với dữ liệu cục bộ (Local Context)
+        # Công thức: Risk = Global_Instability * (1 + Local_Energy)
+        # Ý nghĩa: Nếu thế giới bất ổn, một chấn động nhỏ ở địa phương cũng có thể gây sụp đổ
+        final_risk = global_instability * (0.5 + local_energy)
+
+        return min(final_risk, 1.0)
+
+    def predict_risk_batch(self, lat, lon, local_energy, local_anomaly):
+        """predict_risk cho N điểm cùng lúc (mảng NumPy), cùng công thức và fallback"""
+        energy = np.broadcast_to(np.asarray(local_energy, dtype=np.float64), np.shape(lat))
+        anomaly = np.broadcast_to(np.asarray(local_anomaly, dtype=np.float64), np.shape(lat))
+
+        if len(self.realtime_buffer) < self.look_back:
+            return energy * 0.7 + anomaly * 0.3
+        if not self.is_trained:
+            return (energy + anomaly) / 2.0
+
+        global_instability = self.global_instability
+        if global_instability is None:
+            return np.full(np.shape(lat), 0.5)
+        return np.minimum(global_instability * (0.5 + energy), 1.0)
+
 guardian_brain = DeepGuardian()
\ No newline at end of file
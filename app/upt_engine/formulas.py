@@ -17,6 +17,9 @@ class UPTMath:
     @staticmethod
     def calculate_resonance(sensors: list) -> float:
         """R(t) = Tích hợp cộng hưởng mạng lưới"""
+        if hasattr(sensors, 'sum'): # EventStore (dạng cột) -> tổng vectorized
+            if len(sensors) == 0: return 0.0
+            return (sensors.sum('anomaly_score') * sensors.sum('energy_level')) / len(sensors)
         if not sensors: return 0.0
         total_anomaly = sum(s.get('anomaly_score', 0) for s in sensors)
         total_energy = sum(s.get('energy_level', 0) for s in sensors)
@@ -1,12 +1,21 @@
 import numpy as np
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
+from collections import deque
 from datetime import timedelta
 import os
 import joblib
 
 # Import kết nối Database
 from app.core.database import Database
+from app.models.features import (
+    FAULT_LINES, SENSOR_ROWS_PER_SNAPSHOT, decode_sensor_rows, distance_to_fault, merged_history,
+    sensor_rows_from_records
+)
+
+LABEL_HORIZON_SECONDS = 24 * 3600 # Nhãn = động đất lớn nhất trong 24h tới
+SENSORS_PER_LOG = SENSOR_ROWS_PER_SNAPSHOT # Lấy mẫu tối đa 20 trạm/log
+HISTORY_LIMIT = int(os.getenv("NEURAL_HISTORY_LIMIT", 1000)) # Số snapshot tối đa mỗi lần train
 
 class GuardianAI:
     def __init__(self):
@@ -16,45 +25,30 @@ class GuardianAI:
         self.is_trained = False
         
         # Danh sách tọa độ Vành đai lửa (Kiến thức địa lý)
-        self.fault_lines = [
-            [36.2, 138.2], [37.7, -122.4], [-33.4, -70.6], 
-            [-6.2, 106.8], [14.0, 121.0], [-41.2, 174.7], 
-            [35.0, 25.0], [28.0, 84.0]
-        ]
+        self.fault_lines = FAULT_LINES
         
         # Khởi tạo buffer
         self.X_buffer = []
         self.y_buffer = []
         
-        # [QUY TRÌNH KHỞI ĐỘNG THÔNG MINH]
-        # 1. Thử kết nối DB và học từ lịch sử
-        if Database.db is not None:
-            print("⏳ [NEURAL CORE] Mining historical data from MongoDB...")
-            count = self.train_from_history()
-            
-            if count > 10:
-                print(f"🧠 [NEURAL CORE] Trained on {count} historical snapshots (Time-Travel Mode).")
-            else:
-                # 2. Nếu không có lịch sử, chạy chế độ chờ (Safe Mode)
-                self._init_safe_mode()
-        else:
-            self._init_safe_mode()
+        # [QUY TRÌNH KHỞI ĐỘNG] Khởi động ở Safe Mode, không train trên event loop.
+        # Học từ lịch sử bằng train_from_history() (nặng: gọi ngoài event loop), xong swap() model mới vào.
+        self._init_safe_mode()
 
     def _get_distance_to_fault(self, lat, lon):
-        """Tính khoảng cách đến điểm đứt gãy gần nhất"""
-        min_dist = 99999.0
-        for f_lat, f_lon in self.fault_lines:
-            # 1 độ ~ 111km
-            dist = np.sqrt((lat - f_lat)**2 + (lon - f_lon)**2) * 111.0
-            if dist < min_dist: min_dist = dist
-        return min_dist
+        """Tính khoảng cách (km) đến điểm đứt gãy gần nhất"""
+        return float(self._distance_to_fault_batch([lat], [lon])[0])
+
+    def _distance_to_fault_batch(self, lat, lon):
+        """Khoảng cách vòng lớn (haversine, km) từ N điểm tới đứt gãy gần nhất"""
+        return distance_to_fault(lat, lon, self.fault_lines)
 
     def _init_safe_mode(self):
         """
         [SAFE MODE] Khởi tạo mô hình ở trạng thái 'rỗng' nhưng không lỗi.
         Dùng vector zero để fit Scaler.
         """
-        print("⚠️ [NEURAL CORE] No history found. Running in SAFE MODE (Waiting for data).")
+        print("⚠️ [NEURAL CORE] Running in SAFE MODE (Waiting for training job).")
         # Vector 5 chiều rỗng: [Lat, Lon, Energy, Anomaly, Dist]
         self.X_buffer = [[0.0, 0.0, 0.0, 0.0, 0.0]]
         self.y_buffer = [0.0]
@@ -67,78 +61,86 @@ class GuardianAI:
         """
         Học từ quá khứ: Input(T) -> Output(T+24h)
         """
-        col = Database.get_collection("raw_logs")
-        
-        # Kiểm tra collection tồn tại an toàn
-        if col is None: return 0
-        
-        try:
-            # Lấy 1000 bản ghi gần nhất
-            logs = list(col.find().sort("timestamp", 1).limit(1000))
-        except Exception as e:
-            print(f"⚠️ DB Read Error: {e}")
-            return 0
+        history = self._load_history()
+        if history is None: return 0
+        times, mags, rows = history
 
-        if len(logs) < 5: return 0 
-        
-        X_history = []
-        y_history = []
-        
-        for i in range(len(logs)):
-            current_log = logs[i]
-            current_time = current_log.get('timestamp')
-            if not current_time: continue
-
-            # Tìm sự kiện lớn nhất trong 24h tới
-            future_max_mag = 0.0
-            found_future = False
-            
-            for j in range(i + 1, len(logs)):
-                future_log = logs[j]
-                future_time = future_log.get('timestamp')
-                if not future_time: continue
-
-                time_diff = (future_time - current_time).total_seconds()
-                if time_diff > 24 * 3600: break # Chỉ nhìn xa 24h
-                
-                mag = future_log.get('max_magnitude', 0)
-                if mag > future_max_mag:
-                    future_max_mag = mag
-                    found_future = True
-            
-            if not found_future: continue 
-
-            sensors = current_log.get('sensors_data', [])
-            if not sensors: continue
-            
-            # Lấy mẫu các trạm để train (Giới hạn 20 trạm/log để nhanh)
-            for s in sensors[:20]: 
-                if 'lat' not in s or 'lon' not in s: continue
-                
-                dist = self._get_distance_to_fault(s['lat'], s['lon'])
-                
-                X_history.append([
-                    s['lat'], s['lon'], 
-                    s.get('energy_level', 0), 
-                    s.get('anomaly_score', 0),
-                    dist
-                ])
-                
-                # Label: Chuẩn hóa Magnitude về [0,1]
-                target_risk = min(1.0, future_max_mag / 9.0)
-                y_history.append(target_risk)
-
-        if not X_history: return 0
+        future_max = self._future_max(times, mags, LABEL_HORIZON_SECONDS)
+        # Tìm thấy sự kiện trong 24h tới (magnitude > 0) mới dùng làm mẫu
+        keep = [i for i in range(len(rows)) if future_max[i] > 0 and len(rows[i])]
+        if not keep: return 0
+
+        X = np.vstack([rows[i] for i in keep]).astype(np.float64)
+        # Label: Chuẩn hóa Magnitude về [0,1], lặp lại cho từng trạm của snapshot
+        y = np.repeat(np.minimum(1.0, future_max[keep] / 9.0), [len(rows[i]) for i in keep])
         
         # Retrain thật
-        X = np.array(X_history)
-        y = np.array(y_history)
-        
         self.scaler.fit(X)
         self.model.fit(self.scaler.transform(X), y)
         self.is_trained = True
         
-        return len(X_history)
+        return len(X)
+
+    def _load_history(self):
+        """
+        (timestamps, max_magnitude, [ma trận dòng trạm]) theo thứ tự thời gian.
+        Đặc trưng tính sẵn lúc ingest (feature_store); snapshot chưa có trong feature_store
+        thì tính từ raw_logs cũ, 2 nguồn được nối theo timestamp.
+        """
+        try:
+            docs = merged_history(
+                Database.get_collection("feature_store"), Database.get_collection("raw_logs"),
+                {}, 1, HISTORY_LIMIT,
+                {"_id": 0, "timestamp": 1, "max_magnitude": 1, "sensor_rows": 1},
+                # Chỉ lấy các trường cần cho train (20 trạm đầu của mỗi log)
+                {"timestamp": 1, "max_magnitude": 1, "sensors_data": {"$slice": SENSORS_PER_LOG}},
+            )
+        except Exception as e:
+            print(f"⚠️ DB Read Error: {e}")
+            return None
+
+        # Log không có timestamp không thể làm mốc hay tương lai (giống vòng lặp cũ)
+        docs = [(is_feature, doc) for is_feature, doc in docs if doc.get('timestamp')]
+        logs = [doc for _, doc in docs]
+        rows = [
+            decode_sensor_rows(doc) if is_feature
+            else sensor_rows_from_records((doc.get('sensors_data') or [])[:SENSORS_PER_LOG])
+            for is_feature, doc in docs
+        ]
+
+        if len(logs) < 5: return None
+        times = np.array([log['timestamp'].timestamp() for log in logs])
+        mags = np.array([log.get('max_magnitude') or 0.0 for log in logs], dtype=np.float64)
+        return times, mags, rows
+
+    @staticmethod
+    def _future_max(times, mags, horizon):
+        """
+        Với mỗi snapshot i (times tăng dần): max magnitude của các snapshot j > i có
+        times[j] - times[i] <= horizon. Cửa sổ trượt 2 con trỏ + deque đơn điệu: O(n).
+        """
+        n = len(times)
+        result = np.zeros(n)
+        window = deque() # Chỉ số trong cửa sổ, magnitude giảm dần từ trái sang phải
+        right = 0
+        for i in range(n):
+            limit = times[i] + horizon
+            while right < n and times[right] <= limit:
+                if right > i:
+                    while window and mags[window[-1]] <= mags[right]:
+                        window.pop()
+                    window.append(right)
+                right += 1
+            while window and window[0] <= i:
+                window.popleft()
+            if window: result[i] = mags[window[0]]
+        return result
+
+    def swap(self, model, scaler):
+        """Thay model + scaler đã train (từ training job) vào bộ não đang phục vụ"""
+        self.model, self.scaler = model, scaler
+        self.is_trained = True
+        print("🧠 [NEURAL CORE] Trained model swapped in (Time-Travel Mode).")
 
     def learn(self, sensors_data):
         # Level 2: Chủ yếu học từ DB (train_from_history).
@@ -163,4 +165,23 @@ class GuardianAI:
         except Exception:
             return 0.0
 
+    def predict_risk_batch(self, lat, lon, energy, anomaly):
+        """predict_risk cho N điểm: 1 lần scaler.transform + model.predict cho cả lô"""
+        lat = np.asarray(lat, dtype=np.float64)
+        lon = np.asarray(lon, dtype=np.float64)
+        energy = np.broadcast_to(np.asarray(energy, dtype=np.float64), lat.shape)
+        anomaly = np.broadcast_to(np.asarray(anomaly, dtype=np.float64), lat.shape)
+
+        if not self.is_trained:
+            return (energy * 0.7) + (anomaly * 0.3)
+
+        try:
+            model, scaler = self.model, self.scaler # Chạy trong thread: giữ cặp nhất quán nếu swap() xen vào
+            dist = self._distance_to_fault_batch(lat, lon)
+            input_data = np.column_stack([lat, lon, energy, anomaly, dist])
+            prediction = model.predict(scaler.transform(input_data))
+            return np.clip(prediction, 0.0, 1.0)
+        except Exception:
+            return np.zeros(lat.shape)
+
 guardian_brain = GuardianAI()
\ No newline at end of file
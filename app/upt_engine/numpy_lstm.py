@@ -0,0 +1,85 @@
+import numpy as np
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class NumpyLSTM:
+    """
+    Suy luận LSTM thuần NumPy cho kiến trúc của DeepGuardian._build_brain:
+    các lớp LSTM xếp chồng (lớp cuối chỉ trả state cuối) + Dense(1, sigmoid).
+    Dropout không có tác dụng lúc suy luận nên được bỏ qua.
+    Trọng số lấy từ model Keras đã train (cùng quy ước cổng i, f, c, o của Keras).
+    """
+
+    def __init__(self, lstm_layers, dense_kernel, dense_bias):
+        # lstm_layers: [(kernel (in, 4u), recurrent_kernel (u, 4u), bias (4u,)), ...]
+        self.lstm_layers = [tuple(np.asarray(w, dtype=np.float32) for w in layer) for layer in lstm_layers]
+        self.dense_kernel = np.asarray(dense_kernel, dtype=np.float32)
+        self.dense_bias = np.asarray(dense_bias, dtype=np.float32)
+
+    @classmethod
+    def from_keras(cls, model):
+        lstm_layers, dense = [], None
+        for layer in model.layers:
+            name = type(layer).__name__
+            if name == "LSTM":
+                lstm_layers.append(layer.get_weights())
+            elif name == "Dense":
+                dense = layer.get_weights()
+        if not lstm_layers or dense is None:
+            raise ValueError("Model is not an LSTM + Dense stack")
+        return cls(lstm_layers, dense[0], dense[1])
+
+    def save(self, path):
+        arrays = {"dense_kernel": self.dense_kernel, "dense_bias": self.dense_bias}
+        for i, (kernel, recurrent, bias) in enumerate(self.lstm_layers):
+            arrays[f"lstm{i}_kernel"] = kernel
+            arrays[f"lstm{i}_recurrent"] = recurrent
+            arrays[f"lstm{i}_bias"] = bias
+        # Truyền file object để np.savez không tự thêm đuôi .npz (cho phép ghi ra file tạm)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            lstm_layers = []
+            while f"lstm{len(lstm_layers)}_kernel" in data:
+                i = len(lstm_layers)
+                lstm_layers.append((data[f"lstm{i}_kernel"], data[f"lstm{i}_recurrent"], data[f"lstm{i}_bias"]))
+            return cls(lstm_layers, data["dense_kernel"], data["dense_bias"])
+
+    @staticmethod
+    def _lstm(x, kernel, recurrent, bias, return_sequences):
+        batch, steps, _ = x.shape
+        units = recurrent.shape[0]
+        h = np.zeros((batch, units), dtype=np.float32)
+        c = np.zeros((batch, units), dtype=np.float32)
+        # Phần input của cả chuỗi tính 1 lần bằng 1 phép nhân ma trận
+        x_proj = x @ kernel + bias
+        outputs = np.empty((batch, steps, units), dtype=np.float32) if return_sequences else None
+        for t in range(steps):
+            z = x_proj[:, t] + h @ recurrent
+            i = _sigmoid(z[:, :units])
+            f = _sigmoid(z[:, units:2 * units])
+            g = np.tanh(z[:, 2 * units:3 * units])
+            o = _sigmoid(z[:, 3 * units:])
+            c = f * c + i * g
+            h = o * np.tanh(c)
+            if return_sequences: outputs[:, t] = h
+        return outputs if return_sequences else h
+
+    def predict(self, x):
+        """x: (batch, look_back, features) -> (batch,) xác suất trong [0, 1]"""
+        h = np.asarray(x, dtype=np.float32)
+        if h.ndim == 2: h = h[None]
+        last = len(self.lstm_layers) - 1
+        for i, (kernel, recurrent, bias) in enumerate(self.lstm_layers):
+            h = self._lstm(h, kernel, recurrent, bias, return_sequences=i < last)
+        return _sigmoid(h @ self.dense_kernel + self.dense_bias)[:, 0]
+
+    def __call__(self, x, training=False):
+        """Cùng dạng gọi với model Keras: trả về (batch, 1)"""
+        return self.predict(x)[:, None]
@@ -34,6 +34,9 @@ class UPTReactorCore:
         # Bão mặt trời gây ra nhiễu từ trường tồn dư, giảm rất chậm theo thời gian
         self.geomagnetic_residual = 0.0 
 
+        # Callback được gọi sau mỗi tick vật lý (vd: phát trạng thái cho WebSocket)
+        self._tick_listeners = []
+
     def start_reactor(self):
         if not self.is_running:
             self.is_running = True
@@ -43,6 +46,12 @@ class UPTReactorCore:
             self.neutron_flux = 1.0 
             asyncio.create_task(self._run_simulation_loop())
 
+    def resume_reactor(self):
+        """Tiếp tục vòng lặp vật lý từ trạng thái hiện có (không reset như Ignition)"""
+        if not self.is_running and self.status_code != "OFFLINE":
+            self.is_running = True
+            asyncio.create_task(self._run_simulation_loop())
+
     def trigger_phase_detuning(self):
         if self.status_code == "SCRAM": return
         print("🚨 [UPT-RC] EMERGENCY SCRAM: PHASE DE-TUNING SHOCK EXECUTED!")
@@ -69,10 +78,31 @@ class UPTReactorCore:
             print(f"⚠️ [UPT-RC] Seismic Wave Impact: {stress_level}")
             self.phase_noise += stress_level * 0.5
 
+    def manual_scram(self):
+        """Dập lò khẩn cấp thủ công (SCRAM)"""
+        # Can thiệp trực tiếp vào các chỉ số lõi
+        self.control_rods = 100.0  # Hạ hết thanh điều khiển
+        self.neutron_flux = 0.0    # Cắt dòng neutron
+        self.k_eff = 0.0           # Triệt tiêu phản ứng chuỗi
+        self.core_temp = 300.0     # Reset nhiệt độ về mức thường
+        self.notify_listeners()    # Đẩy trạng thái mới ngay, không chờ tick
+
+    def add_tick_listener(self, callback):
+        """Đăng ký callback(reactor) chạy sau mỗi tick vật lý"""
+        self._tick_listeners.append(callback)
+
+    def notify_listeners(self):
+        for callback in self._tick_listeners:
+            try:
+                callback(self)
+            except Exception as e:
+                print(f"⚠️ [REACTOR LISTENER ERROR] {e}")
+
     async def _run_simulation_loop(self):
         while self.is_running:
             try:
                 self._tick_physics()
+                self.notify_listeners()
                 await asyncio.sleep(1)
             except Exception as e:
                 print(f"⚠️ [REACTOR ERROR] {e}")
@@ -0,0 +1,177 @@
+import numpy as np
+
+from app.upt_engine.formulas import UPTMath
+from app.upt_engine.reactor_core import UPTReactorCore
+
+# Mã trạng thái dạng số cho mảng NumPy
+NOMINAL, WARNING, CRITICAL, SCRAM, OFFLINE = range(5)
+STATUS_NAMES = ["NOMINAL", "WARNING", "CRITICAL", "SCRAM", "OFFLINE"]
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+STATUS_CODES["STARTUP"] = NOMINAL
+
+
+def flare_energy(class_type: str) -> float:
+    """Class lóa mặt trời -> năng lượng (cùng thang với DisasterService._parse_solar)"""
+    energy = 0.1
+    if 'C' in class_type: energy = 0.3
+    if 'M' in class_type: energy = 0.6
+    if 'X' in class_type: energy = 1.0
+    return energy
+
+
+class ReactorEnsemble:
+    """
+    Monte Carlo ensemble cho UPT-RC: N lò phản ứng được biểu diễn bằng các mảng NumPy
+    và cùng tiến 1 tick bằng phép toán vector hóa.
+    Vật lý giống hệt UPTReactorCore._tick_physics (phân rã từ dư, k_eff, flux,
+    nhiệt động học, nhánh SCRAM), chỉ khác nhiễu lượng tử được rút độc lập cho từng thành viên.
+    """
+
+    def __init__(self, reactor: UPTReactorCore, members: int, seed=None):
+        self.n = members
+        self.rng = np.random.default_rng(seed)
+        full = lambda v: np.full(members, float(v))
+
+        self.core_temp = full(reactor.core_temp)
+        self.neutron_flux = full(reactor.neutron_flux)
+        self.k_eff = full(reactor.k_eff)
+        self.r_plasma = full(reactor.r_plasma)
+        self.control_rods = full(reactor.control_rods)
+        self.cryo_cooling = full(reactor.cryo_cooling)
+        self.phase_noise = full(reactor.phase_noise)
+        self.geomagnetic_residual = full(reactor.geomagnetic_residual)
+
+        code = OFFLINE if not reactor.is_running else STATUS_CODES.get(reactor.status_code, NOMINAL)
+        self.status = np.full(members, code, dtype=np.int8)
+
+        # Thống kê tích lũy qua các tick
+        self.ever_critical = self.status == CRITICAL
+        self.ever_scram = self.status == SCRAM
+        self.first_critical = np.where(self.ever_critical, 0, -1)
+        self.max_temp = self.core_temp.copy()
+        self.ticks = 0
+
+    # --- SỰ KIỆN NGOẠI CẢNH (giống UPTReactorCore) ---
+    def update_external_stress(self, stress_level: float):
+        if stress_level > 0.5:
+            active = self.status != OFFLINE
+            self.phase_noise[active] += stress_level * 0.5
+
+    def inject_cosmic_interference(self, coupling_factor: float):
+        if coupling_factor > 0.05:
+            self.geomagnetic_residual[self.status != OFFLINE] += coupling_factor
+
+    def apply_earthquake(self, magnitude: float):
+        """Giống luồng ingest: chỉ động đất >= M6.0 mới gây sốc cho lò"""
+        if magnitude >= 6.0:
+            self.update_external_stress(min(max(magnitude / 9.0, 0.0), 1.0))
+
+    def apply_solar_flare(self, class_type: str):
+        """Giống luồng ingest: năng lượng flare -> hệ số liên kết -> tiêm nhiễu nếu > 0.1"""
+        coupling = UPTMath.calculate_geomagnetic_coupling(flare_energy(class_type))
+        if coupling > 0.1:
+            self.inject_cosmic_interference(coupling)
+
+    # --- TICK VECTOR HÓA ---
+    def step(self):
+        C = UPTReactorCore
+        offline = self.status == OFFLINE
+        scram = self.status == SCRAM
+        live = ~(offline | scram)
+        hit_critical = np.zeros(self.n, dtype=bool)
+
+        # Nhánh SCRAM: dập lò, nguội dần, tắt hẳn khi flux < 1
+        if scram.any():
+            self.neutron_flux[scram] *= 0.5
+            self.core_temp[scram] += (300 - self.core_temp[scram]) * 0.1
+            self.k_eff[scram] = 0
+            shutdown = scram & (self.neutron_flux < 1.0)
+            self.status[shutdown] = OFFLINE
+
+        if live.any():
+            idx = np.flatnonzero(live)
+            m = len(idx)
+
+            # 1. Phân rã từ trường tồn dư
+            residual = self.geomagnetic_residual[idx] * 0.99
+            self.geomagnetic_residual[idx] = residual
+
+            # 2. Phase Noise tổng hợp
+            noise = np.abs(self.rng.uniform(-0.01, 0.01, m) + residual * 2.0)
+            noise = np.where(noise > 2.0, noise * 0.9, noise)
+            self.phase_noise[idx] = noise
+
+            # 3. K_eff
+            flux = self.neutron_flux[idx]
+            ai_damp = (self.control_rods[idx] / 100.0) * 0.5
+            e_p = (flux / 50.0) + C.CONST_TAU_ION
+            r_plasma = self.r_plasma[idx]
+            k_eff = (e_p * C.CONST_C_GEO * r_plasma) / (1.0 + noise + ai_damp)
+            self.k_eff[idx] = k_eff
+
+            # 4. Neutron Flux
+            flux = np.maximum(flux, 1.0)
+            flux = np.maximum(0.0, flux + flux * (k_eff - 1.0) * 0.5)
+            self.neutron_flux[idx] = flux
+
+            # 5. Nhiệt động học
+            temp = self.core_temp[idx] + (flux * 5.0 - self.cryo_cooling[idx] * 4.0) * 0.1
+            temp = np.maximum(temp, 300.0)
+            self.core_temp[idx] = temp
+
+            # 6. R_plasma
+            stability_delta = np.where(noise > 0.1, 0.01 - 0.05, 0.01)
+            r_plasma = np.clip(r_plasma + stability_delta, 0.0, 1.0)
+            self.r_plasma[idx] = r_plasma
+
+            # 7. Trạng thái
+            status = np.full(m, NOMINAL, dtype=np.int8)
+            status[(temp > 1500) | (r_plasma < 0.6) | (residual > 0.5)] = WARNING
+            critical = (temp > 2500) | (r_plasma < 0.2)
+            status[critical] = CRITICAL
+            hit_critical[idx] = critical
+
+            # Giao thức an toàn: 10% xác suất SCRAM mỗi tick khi CRITICAL
+            detune = critical & (self.rng.random(m) < 0.1)
+            status[detune] = SCRAM
+            d_idx = idx[detune]
+            self.control_rods[d_idx] = 100.0
+            self.phase_noise[d_idx] = 10.0
+            self.r_plasma[d_idx] = 0.0
+            self.status[idx] = status
+
+        self.ticks += 1
+        # Tính cả thành viên vừa CRITICAL và bị SCRAM ngay trong cùng tick
+        newly_critical = hit_critical & ~self.ever_critical
+        self.first_critical[newly_critical] = self.ticks
+        self.ever_critical |= hit_critical
+        self.ever_scram |= self.status == SCRAM
+        np.maximum(self.max_temp, self.core_temp, out=self.max_temp)
+
+    def run(self, ticks: int):
+        for _ in range(ticks):
+            self.step()
+        return self
+
+    # --- KẾT QUẢ ---
+    @staticmethod
+    def _percentiles(values):
+        p = np.percentile(values, [5, 25, 50, 75, 95])
+        return {"p5": float(p[0]), "p25": float(p[1]), "p50": float(p[2]), "p75": float(p[3]), "p95": float(p[4]),
+                "mean": float(values.mean())}
+
+    def summary(self):
+        final_counts = np.bincount(self.status, minlength=len(STATUS_NAMES))
+        reached = self.first_critical[self.first_critical >= 0]
+        return {
+            "members": self.n,
+            "ticks": self.ticks,
+            "p_scram": float(self.ever_scram.mean()),
+            "p_critical": float(self.ever_critical.mean()),
+            "final_status": {name: float(c) / self.n for name, c in zip(STATUS_NAMES, final_counts.tolist())},
+            "ticks_to_critical": self._percentiles(reached.astype(np.float64)) if len(reached) else None,
+            "max_core_temp": self._percentiles(self.max_temp),
+            "final_core_temp": self._percentiles(self.core_temp),
+            "final_k_eff": self._percentiles(self.k_eff),
+            "final_r_plasma": self._percentiles(self.r_plasma),
+        }
@@ -0,0 +1,93 @@
+import math
+import random
+
+import numpy as np
+
+from app.upt_engine.reactor_core import UPTReactorCore
+from app.upt_engine.reactor_ensemble import NOMINAL, WARNING, CRITICAL, SCRAM, OFFLINE, STATUS_CODES, STATUS_NAMES
+
+# Cột của quỹ đạo trả về
+TRAJECTORY_FIELDS = ["tick", "status", "core_temp", "neutron_flux", "k_eff", "r_plasma",
+                     "phase_noise", "magnetic_residual"]
+
+
+def fast_forward(reactor: UPTReactorCore, ticks: int, seed=None, events=(), max_points=200):
+    """
+    Tua nhanh: sao chép trạng thái lò hiện tại rồi chạy `ticks` tick vật lý liên tiếp,
+    không sleep. Cùng seed + cùng lịch sự kiện -> cùng kết quả.
+
+    events: [(tick, "shock" | "cosmic", value)] - sự kiện được áp ngay trước tick đó,
+            cùng ngưỡng với update_external_stress / inject_cosmic_interference.
+    Trả về quỹ đạo lấy mẫu tối đa max_points điểm (mảng (points, 8), cột theo TRAJECTORY_FIELDS).
+    """
+    rng = random.Random(seed)
+    uniform, rand = rng.uniform, rng.random
+    C_GEO, TAU = UPTReactorCore.CONST_C_GEO, UPTReactorCore.CONST_TAU_ION
+
+    # Trạng thái clone vào biến cục bộ (truy cập nhanh hơn thuộc tính)
+    temp, flux, k_eff = reactor.core_temp, reactor.neutron_flux, reactor.k_eff
+    r_plasma, noise, residual = reactor.r_plasma, reactor.phase_noise, reactor.geomagnetic_residual
+    rods, cryo = reactor.control_rods, reactor.cryo_cooling
+    status = OFFLINE if not reactor.is_running else STATUS_CODES.get(reactor.status_code, NOMINAL)
+
+    schedule = sorted((int(t), kind, float(v)) for t, kind, v in events)
+    next_event = 0
+    n_events = len(schedule)
+
+    stride = max(1, math.ceil(ticks / max(1, max_points)))
+    out = np.empty((ticks // stride + 1, len(TRAJECTORY_FIELDS)), dtype=np.float64)
+    out[0] = (0, status, temp, flux, k_eff, r_plasma, noise, residual)
+    row = 1
+
+    for tick in range(1, ticks + 1):
+        # Sự kiện ngoại cảnh theo lịch
+        while next_event < n_events and schedule[next_event][0] <= tick:
+            _, kind, value = schedule[next_event]
+            next_event += 1
+            if status == OFFLINE: continue
+            if kind == "shock" and value > 0.5: noise += value * 0.5
+            elif kind == "cosmic" and value > 0.05: residual += value
+
+        if status == SCRAM:
+            flux *= 0.5
+            temp += (300 - temp) * 0.1
+            k_eff = 0.0
+            if flux < 1.0: status = OFFLINE
+        elif status != OFFLINE:
+            residual *= 0.99
+            noise = abs(uniform(-0.01, 0.01) + residual * 2.0)
+            if noise > 2.0: noise *= 0.9
+
+            k_eff = ((flux / 50.0) + TAU) * C_GEO * r_plasma / (1.0 + noise + (rods / 100.0) * 0.5)
+
+            if flux < 1.0: flux = 1.0
+            flux = max(0.0, flux + flux * (k_eff - 1.0) * 0.5)
+
+            temp += (flux * 5.0 - cryo * 4.0) * 0.1
+            if temp < 300: temp = 300.0
+
+            r_plasma = max(0.0, min(1.0, r_plasma + (0.01 - 0.05 if noise > 0.1 else 0.01)))
+
+            if temp > 2500 or r_plasma < 0.2:
+                status = CRITICAL
+                if rand() < 0.1: # Phase de-tuning SCRAM
+                    status = SCRAM
+                    rods, noise, r_plasma = 100.0, 10.0, 0.0
+            elif temp > 1500 or r_plasma < 0.6 or residual > 0.5:
+                status = WARNING
+            else:
+                status = NOMINAL
+
+        if tick % stride == 0:
+            out[row] = (tick, status, temp, flux, k_eff, r_plasma, noise, residual)
+            row += 1
+
+    return out[:row]
+
+
+def trajectory_to_dict(trajectory):
+    """Mảng quỹ đạo -> JSON dạng cột (gọn hơn danh sách object)"""
+    result = {field: trajectory[:, i].tolist() for i, field in enumerate(TRAJECTORY_FIELDS)}
+    result["tick"] = trajectory[:, 0].astype(np.int64).tolist()
+    result["status"] = [STATUS_NAMES[int(c)] for c in trajectory[:, 1]]
+    return result
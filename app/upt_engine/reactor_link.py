@@ -0,0 +1,323 @@
+import asyncio
+import glob
+import inspect
+import json
+import os
+import socket
+import time
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from app.upt_engine.reactor_core import UPTReactorCore, upt_reactor
+
+# Bố cục block shared memory: [seq: uint64][STATE_FIELDS: float64...]
+STATE_FIELDS = ["core_temp", "neutron_flux", "k_eff", "r_plasma", "control_rods", "cryo_cooling",
+                "phase_noise", "geomagnetic_residual", "status", "is_running"]
+STATUS_NAMES = ["OFFLINE", "STARTUP", "NOMINAL", "WARNING", "CRITICAL", "SCRAM"]
+STATUS_CODES = {name: code for code, name in enumerate(STATUS_NAMES)}
+
+# Lệnh được phép gửi qua hàng đợi liên process (tên method của UPTReactorCore)
+COMMANDS = {"update_external_stress", "inject_cosmic_interference", "manual_scram"}
+
+
+class SharedReactorState:
+    """
+    Trạng thái lò trong 1 block shared memory, đồng bộ kiểu seqlock:
+    writer (duy nhất) tăng seq lên số lẻ -> ghi -> tăng lên số chẵn;
+    reader copy dữ liệu và đọc lại seq, nếu seq lẻ hoặc đã đổi thì đọc lại. Không cần khóa.
+    """
+
+    SIZE = 8 + 8 * len(STATE_FIELDS)
+    READ_RETRIES = 100 # Số lần đọc lại tối đa (writer chết giữa chừng -> seq lẻ mãi)
+
+    def __init__(self, name, create=False):
+        if create:
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=self.SIZE)
+            except FileExistsError: # Block của owner trước vẫn còn -> dùng tiếp
+                shm = shared_memory.SharedMemory(name=name)
+        else:
+            shm = shared_memory.SharedMemory(name=name)
+        # Không để resource_tracker của process này xóa block khi thoát (worker khác vẫn đang dùng)
+        try:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+
+        self.shm = shm
+        self.seq = np.ndarray((1,), dtype=np.uint64, buffer=shm.buf, offset=0)
+        self.fields = np.ndarray((len(STATE_FIELDS),), dtype=np.float64, buffer=shm.buf, offset=8)
+
+    def write(self, reactor: UPTReactorCore):
+        """Tick listener của owner: xuất bản trạng thái hiện tại"""
+        self.seq[0] += 1 # Lẻ = đang ghi
+        f = self.fields
+        f[0] = reactor.core_temp
+        f[1] = reactor.neutron_flux
+        f[2] = reactor.k_eff
+        f[3] = reactor.r_plasma
+        f[4] = reactor.control_rods
+        f[5] = reactor.cryo_cooling
+        f[6] = reactor.phase_noise
+        f[7] = reactor.geomagnetic_residual
+        f[8] = STATUS_CODES.get(reactor.status_code, 0)
+        f[9] = 1.0 if reactor.is_running else 0.0
+        self.seq[0] += 1
+
+    def read(self):
+        """Trả về (seq, bản sao các trường) nhất quán, hoặc None nếu hết số lần thử"""
+        for _ in range(self.READ_RETRIES):
+            before = int(self.seq[0])
+            if before & 1:
+                time.sleep(0) # Writer đang ghi dở
+                continue
+            data = self.fields.copy()
+            if int(self.seq[0]) == before:
+                return before, data
+        return None
+
+    def recover(self):
+        """
+        Gọi khi đã giữ lock owner (không còn writer nào): owner trước chết giữa lúc ghi thì seq
+        kẹt ở số lẻ -> ép về chẵn và lấy nguyên các trường đã xuất bản. Trả về (seq, dữ liệu).
+        """
+        if int(self.seq[0]) & 1:
+            self.seq[0] += 1
+            print("⚠️ [REACTOR LINK] Previous owner died mid-write, resuming from last published fields")
+        return int(self.seq[0]), self.fields.copy()
+
+    def close(self, unlink=False):
+        del self.seq, self.fields # Phải bỏ view numpy trước khi đóng buffer
+        self.shm.close()
+        if unlink:
+            try:
+                # Đăng ký lại để unlink() hủy đăng ký đúng với resource_tracker
+                resource_tracker.register(self.shm._name, "shared_memory")
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def remove_stale(prefix, keep):
+        """Xóa block của các lần chạy trước (process master đã chết) còn sót trong /dev/shm"""
+        for path in glob.glob(f"/dev/shm/{prefix}_*"):
+            name = os.path.basename(path)
+            if name == keep: continue
+            try:
+                os.kill(int(name.rsplit("_", 1)[1]), 0)
+            except ProcessLookupError:
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except (ValueError, PermissionError):
+                pass # Không phải block của ta / process vẫn sống
+
+
+class ReactorLink:
+    """
+    Điều phối lò phản ứng khi chạy nhiều worker (REACTOR_MODE=shared):
+    - Worker giữ được file lock là owner: chạy tick vật lý, xuất bản trạng thái vào shared memory
+      và nhận lệnh qua Unix datagram socket.
+    - Các worker còn lại là follower: đồng bộ trạng thái từ shared memory vào upt_reactor cục bộ
+      (nên WebSocket, /history, /ensemble... vẫn dùng upt_reactor như cũ) và chuyển lệnh cho owner.
+    - Owner chết -> OS nhả lock, 1 follower tiếp quản và chạy tiếp từ trạng thái đã xuất bản.
+    - Block shared memory gắn với lần chạy (PID process master của uvicorn): trạng thái của lần
+      chạy trước không bị dùng lại; owner xóa block khi tắt bình thường.
+    Chỉ worker chính (is_primary: local hoặc owner) chạy các dịch vụ nền (ingest, cảnh báo, ghi DB,
+    training) - đăng ký qua on_promote(), được gọi cả khi follower tiếp quản.
+    Lệnh từ API phải đi qua command().
+    Chế độ mặc định (local) giữ nguyên hành vi 1 process.
+    """
+
+    MODE = os.getenv("REACTOR_MODE", "local")
+    SHM_NAME = os.getenv("REACTOR_SHM_NAME", "upt_reactor_state")
+    LOCK_FILE = os.getenv("REACTOR_LOCK_FILE", "/tmp/upt_reactor.lock")
+    CMD_SOCKET = os.getenv("REACTOR_CMD_SOCKET", "/tmp/upt_reactor.sock")
+
+    SYNC_INTERVAL = 0.2     # Giây giữa 2 lần follower đọc trạng thái
+    TAKEOVER_INTERVAL = 2.0 # Giây giữa 2 lần follower thử giành quyền owner
+
+    def __init__(self, reactor: UPTReactorCore):
+        self.reactor = reactor
+        self.role = None # local | owner | follower
+        self.state = None
+        self._lock_fd = None
+        self._cmd_sock = None
+        self._send_sock = None
+        self._task = None
+        self._promote_callbacks = []
+        # Thế hệ = process master (chung cho mọi worker của 1 lần chạy)
+        self.generation = os.getppid()
+        self.shm_name = f"{self.SHM_NAME}_{self.generation}"
+
+    @property
+    def is_primary(self):
+        """Worker chính: chạy lò local hoặc giữ quyền owner (chưa start() cũng coi là chính)"""
+        return self.role != "follower"
+
+    def on_promote(self, callback):
+        """Đăng ký callback (sync hoặc async) chạy khi worker này trở thành worker chính"""
+        self._promote_callbacks.append(callback)
+
+    async def _promote(self):
+        for callback in self._promote_callbacks:
+            try:
+                result = callback()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                print(f"⚠️ [REACTOR LINK] Primary service failed to start: {e}")
+
+    async def start(self):
+        if self.MODE != "shared":
+            self.role = "local"
+            self.reactor.start_reactor()
+            await self._promote()
+            return
+        if self._try_lock():
+            self._become_owner()
+            await self._promote()
+        else:
+            self.role = "follower"
+            print(f"🔗 [REACTOR LINK] Worker {os.getpid()} following shared reactor state")
+            self._task = asyncio.create_task(self._follow())
+
+    def command(self, name, *args):
+        """Thực thi lệnh trên lò chung. Trả về False nếu không chuyển được cho owner."""
+        if name not in COMMANDS:
+            raise ValueError(f"Unknown reactor command: {name}")
+        if self.role != "follower":
+            getattr(self.reactor, name)(*args)
+            return True
+        try:
+            if self._send_sock is None:
+                self._send_sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self._send_sock.sendto(json.dumps({"cmd": name, "args": list(args)}).encode(), self.CMD_SOCKET)
+            return True
+        except OSError as e:
+            print(f"⚠️ [REACTOR LINK] Command '{name}' not delivered: {e}")
+            return False
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._cmd_sock is not None:
+            asyncio.get_running_loop().remove_reader(self._cmd_sock.fileno())
+            self._cmd_sock.close()
+            self._cmd_sock = None
+        if self._send_sock is not None:
+            self._send_sock.close()
+            self._send_sock = None
+        owner = self.role == "owner"
+        if owner:
+            self.reactor.is_running = False
+        if self.state is not None:
+            # Owner tắt bình thường -> xóa block (không để rò trong /dev/shm)
+            self.state.close(unlink=owner)
+            self.state = None
+        if self._lock_fd is not None:
+            os.close(self._lock_fd) # Nhả lock cho worker khác tiếp quản
+            self._lock_fd = None
+
+    # --- OWNER ---
+    def _try_lock(self):
+        import fcntl # Chỉ có trên Unix, chỉ cần ở chế độ shared
+        if self._lock_fd is None:
+            self._lock_fd = os.open(self.LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+
+    def _become_owner(self):
+        self.role = "owner"
+        data = None
+        if self.state is not None:
+            # Follower tiếp quản: lấy trạng thái cuối từ mapping cũ rồi mở lại theo tên
+            # (owner trước tắt bình thường thì block đã bị xóa -> tạo block mới)
+            _, data = self.state.recover()
+            self.state.close()
+        SharedReactorState.remove_stale(self.SHM_NAME, keep=self.shm_name)
+        self.state = SharedReactorState(self.shm_name, create=True)
+        _, published = self.state.recover()
+        if data is None:
+            data = published
+        if data[8] != STATUS_CODES["OFFLINE"]:
+            # Owner trước đã chạy lò -> tiếp tục từ trạng thái đã xuất bản
+            self._apply(data)
+            self.reactor.is_running = False
+            self.reactor.resume_reactor()
+        else:
+            self.reactor.start_reactor()
+
+        self.reactor.add_tick_listener(self.state.write)
+        self.state.write(self.reactor)
+        self._open_command_socket()
+        print(f"☢️ [REACTOR LINK] Worker {os.getpid()} owns the physics tick")
+
+    def _open_command_socket(self):
+        try:
+            os.unlink(self.CMD_SOCKET)
+        except FileNotFoundError:
+            pass
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(self.CMD_SOCKET)
+        sock.setblocking(False)
+        self._cmd_sock = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._drain_commands)
+
+    def _drain_commands(self):
+        while True:
+            try:
+                data = self._cmd_sock.recv(4096)
+            except BlockingIOError:
+                return
+            try:
+                msg = json.loads(data)
+                if msg["cmd"] not in COMMANDS: raise ValueError(msg["cmd"])
+                getattr(self.reactor, msg["cmd"])(*msg.get("args", []))
+            except Exception as e:
+                print(f"⚠️ [REACTOR LINK] Bad command: {e}")
+
+    # --- FOLLOWER ---
+    def _apply(self, data):
+        r = self.reactor
+        (r.core_temp, r.neutron_flux, r.k_eff, r.r_plasma, r.control_rods,
+         r.cryo_cooling, r.phase_noise, r.geomagnetic_residual) = (float(x) for x in data[:8])
+        r.status_code = STATUS_NAMES[int(data[8])]
+        r.is_running = bool(data[9])
+
+    async def _follow(self):
+        last_seq = None
+        next_takeover = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= next_takeover:
+                next_takeover = now + self.TAKEOVER_INTERVAL
+                if self._try_lock():
+                    self._task = None
+                    self._become_owner()
+                    await self._promote()
+                    return
+
+            if self.state is None:
+                try:
+                    self.state = SharedReactorState(self.shm_name)
+                except FileNotFoundError:
+                    pass # Owner chưa tạo block
+            snapshot = self.state.read() if self.state is not None else None
+            if snapshot is not None: # None: owner kẹt/chết giữa lúc ghi -> bỏ qua, chờ tiếp quản
+                seq, data = snapshot
+                if seq != last_seq:
+                    last_seq = seq
+                    self._apply(data)
+                    self.reactor.notify_listeners()
+
+            await asyncio.sleep(self.SYNC_INTERVAL)
+
+
+reactor_link = ReactorLink(upt_reactor)
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+
+import numpy as np
+
+# Các chỉ số số học được lưu mỗi tick (tên khớp với get_status())
+HISTORY_FIELDS = ["core_temp", "neutron_flux", "k_eff", "r_plasma", "phase_noise", "magnetic_residual"]
+
+
+class TelemetryHistory:
+    """
+    Ring buffer cố định kích thước cho telemetry của lò: mảng cấp phát sẵn 1 lần,
+    tick mới ghi đè tick cũ nhất -> bộ nhớ không đổi dù chạy nhiều ngày.
+    Truy vấn gom theo bucket (min/max/mean) bằng phép giảm vector hóa.
+    """
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.zeros((capacity, len(HISTORY_FIELDS)), dtype=np.float32)
+        self._head = 0 # Vị trí ghi tiếp theo
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    def record(self, reactor):
+        """Tick listener: ghi trạng thái hiện tại của lò vào buffer"""
+        with self._lock:
+            i = self._head
+            self.timestamps[i] = time.time()
+            row = self.values[i]
+            row[0] = reactor.core_temp
+            row[1] = reactor.neutron_flux
+            row[2] = reactor.k_eff
+            row[3] = reactor.r_plasma
+            row[4] = reactor.phase_noise
+            row[5] = reactor.geomagnetic_residual
+            self._head = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def _window(self, start, end):
+        """Bản sao (timestamps, values) theo thứ tự thời gian trong [start, end]"""
+        with self._lock:
+            if self._size < self.capacity:
+                segments = [slice(0, self._size)]
+            else:
+                segments = [slice(self._head, self.capacity), slice(0, self._head)]
+
+            ts_parts, val_parts = [], []
+            for seg in segments:
+                ts = self.timestamps[seg]
+                lo = np.searchsorted(ts, start, side="left")
+                hi = np.searchsorted(ts, end, side="right")
+                if hi > lo:
+                    ts_parts.append(ts[lo:hi].copy())
+                    val_parts.append(self.values[seg][lo:hi].copy())
+
+        if not ts_parts:
+            return np.empty(0), np.empty((0, len(HISTORY_FIELDS)), dtype=np.float32)
+        return np.concatenate(ts_parts), np.concatenate(val_parts)
+
+    def query(self, start, end, buckets):
+        """Chia [start, end] thành `buckets` khoảng đều nhau, trả về min/max/mean của bucket có dữ liệu"""
+        ts, values = self._window(start, end)
+        result = {"start": start, "end": end, "bucket_seconds": (end - start) / buckets,
+                  "t": [], "count": []}
+        for name in HISTORY_FIELDS:
+            result[name] = {"min": [], "max": [], "mean": []}
+        if len(ts) == 0:
+            return result
+
+        edges = np.linspace(start, end, buckets + 1)
+        bounds = np.searchsorted(ts, edges[:-1], side="left")
+        counts = np.diff(np.append(bounds, len(ts)))
+        keep = counts > 0
+        offsets, counts = bounds[keep], counts[keep]
+
+        # Dữ liệu đã sắp theo thời gian -> mỗi bucket là 1 đoạn liên tiếp, reduceat trên cả ma trận
+        mins = np.minimum.reduceat(values, offsets, axis=0)
+        maxs = np.maximum.reduceat(values, offsets, axis=0)
+        means = np.add.reduceat(values.astype(np.float64), offsets, axis=0) / counts[:, None]
+
+        result["t"] = edges[:-1][keep].tolist()
+        result["count"] = counts.tolist()
+        for i, name in enumerate(HISTORY_FIELDS):
+            result[name] = {"min": mins[:, i].tolist(), "max": maxs[:, i].tolist(), "mean": means[:, i].tolist()}
+        return result
+
+
+# Mặc định 3 ngày ở 1 tick/giây (~8 MB)
+reactor_history = TelemetryHistory(int(os.getenv("REACTOR_HISTORY_SIZE", 3 * 24 * 3600)))
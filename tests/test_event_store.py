@@ -0,0 +1,43 @@
+from app.models.event_store import EventStore
+
+
+def _sensor(event_id, place="Tokyo", type_name="EARTHQUAKE", raw_val=5.0, **fields):
+    sensor = {"id": event_id, "type": type_name, "place": place, "lat": 35.0, "lon": 139.0,
+              "energy_level": 0.5, "anomaly_score": 0.2, "raw_val": raw_val}
+    sensor.update(fields)
+    return sensor
+
+
+def _diff(current, previous):
+    current, previous = EventStore.from_sensors(current), EventStore.from_sensors(previous)
+    added, updated, removed = current.diff(previous)
+    return ([current.ids[i] for i in added], [current.ids[i] for i in updated], sorted(removed))
+
+
+def test_diff_added_removed_and_changed():
+    previous = [_sensor("usgs:a"), _sensor("usgs:b"), _sensor("eonet:c", type_name="WILDFIRE"), _sensor("usgs:d")]
+    current = [
+        _sensor("usgs:a"),                          # không đổi
+        _sensor("usgs:b", raw_val=6.1),             # USGS cập nhật magnitude
+        _sensor("eonet:c", type_name="VOLCANO"),    # đổi loại
+        _sensor("usgs:e"),                          # mới
+    ]
+    assert _diff(current, previous) == (["usgs:e"], ["usgs:b", "eonet:c"], ["usgs:d"])
+
+
+def test_diff_detects_each_field():
+    for change in ({"lat": 1.0}, {"lon": 1.0}, {"energy_level": 0.9}, {"anomaly_score": 0.9}, {"place": "Osaka"}):
+        assert _diff([_sensor("usgs:a", **change)], [_sensor("usgs:a")]) == ([], ["usgs:a"], [])
+
+
+def test_diff_compares_place_text_not_intern_index():
+    # Bảng 'places' intern theo thứ tự xuất hiện -> cùng tên có thể mang chỉ số khác giữa 2 snapshot
+    previous = [_sensor("usgs:a", place="Tokyo"), _sensor("usgs:b", place="Lima")]
+    current = [_sensor("usgs:b", place="Lima"), _sensor("usgs:a", place="Tokyo")]
+    assert _diff(current, previous) == ([], [], [])
+
+
+def test_diff_against_empty():
+    sensors = [_sensor("usgs:a"), _sensor("usgs:b")]
+    assert _diff(sensors, []) == (["usgs:a", "usgs:b"], [], [])
+    assert _diff([], sensors) == ([], [], ["usgs:a", "usgs:b"])
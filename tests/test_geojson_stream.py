@@ -0,0 +1,55 @@
+import json
+
+import pytest
+
+from app.services.geojson_stream import GeoJSONFeatureStream
+
+
+def _collection(n):
+    features = [{
+        "type": "Feature",
+        "id": f"us{i:04d}",
+        # Chuỗi có ký tự UTF-8 nhiều byte và ký tự cấu trúc JSON ({ } [ ] , ")
+        "properties": {"mag": 4.5 + i / 10, "place": f"{i} km SẼ of Đà Nẵng [\"zone {{{i}}}\"], Việt Nam"},
+        "geometry": {"type": "Point", "coordinates": [108.2 + i, 16.0 - i, 10.0]},
+    } for i in range(n)]
+    body = {"type": "FeatureCollection", "metadata": {"title": "features: [test]", "count": n},
+            "features": features, "bbox": [-180, -90, 180, 90]}
+    return json.dumps(body, ensure_ascii=False, indent=1).encode("utf-8"), features
+
+
+def _parse(body, chunk_size):
+    stream = GeoJSONFeatureStream()
+    features = []
+    for start in range(0, len(body), chunk_size):
+        features.extend(stream.feed(body[start:start + chunk_size]))
+    stream.close()
+    return features
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64, 4096, 10 ** 7])
+def test_same_features_for_any_chunk_size(chunk_size):
+    body, expected = _collection(25)
+    assert _parse(body, chunk_size) == expected
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 10 ** 6])
+def test_empty_features_array(chunk_size):
+    body, _ = _collection(0)
+    assert _parse(body, chunk_size) == []
+
+
+def test_truncated_body_raises_on_close():
+    body, _ = _collection(3)
+    stream = GeoJSONFeatureStream()
+    stream.feed(body[:len(body) // 2])
+    with pytest.raises(ValueError):
+        stream.close()
+
+
+def test_feed_after_done_is_ignored():
+    body, expected = _collection(2)
+    stream = GeoJSONFeatureStream()
+    assert stream.feed(body) == expected
+    assert stream.done
+    assert stream.feed(b'{"type": "Feature"}') == []
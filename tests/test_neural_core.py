@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from app.upt_engine.neural_core import GuardianAI
+
+
+def _brute_future_max(times, mags, horizon):
+    result = np.zeros(len(times))
+    for i in range(len(times)):
+        future = [mags[j] for j in range(i + 1, len(times)) if times[j] - times[i] <= horizon]
+        if future: result[i] = max(future)
+    return result
+
+
+def test_empty_series():
+    assert len(GuardianAI._future_max([], [], 10)) == 0
+
+
+def test_window_longer_than_series():
+    times = [0, 1, 2, 3]
+    mags = [5.0, 2.0, 4.0, 1.0]
+    # Mọi snapshot sau đều nằm trong cửa sổ; snapshot cuối không có tương lai -> 0
+    assert GuardianAI._future_max(times, mags, 1000).tolist() == [4.0, 4.0, 1.0, 0.0]
+
+
+def test_ties_in_times_and_magnitudes():
+    # Trùng timestamp: snapshot j > i cùng thời điểm vẫn tính là "sau"; trùng magnitude giữ đúng giá trị
+    times = [0, 0, 0, 5, 5, 10]
+    mags = [3.0, 3.0, 3.0, 7.0, 7.0, 3.0]
+    expected = _brute_future_max(times, mags, 5)
+    assert GuardianAI._future_max(times, mags, 5).tolist() == expected.tolist()
+    assert expected.tolist() == [7.0, 7.0, 7.0, 7.0, 3.0, 0.0]
+
+
+@pytest.mark.parametrize("horizon", [0, 1, 7, 50, 10 ** 6])
+def test_matches_brute_force(horizon):
+    rng = np.random.default_rng(horizon)
+    times = np.cumsum(rng.integers(0, 4, 300)) # Bước 0 -> có timestamp trùng
+    mags = rng.integers(0, 6, 300).astype(float) # Ít giá trị -> nhiều magnitude trùng
+    np.testing.assert_array_equal(GuardianAI._future_max(times, mags, horizon), _brute_future_max(times, mags, horizon))
@@ -0,0 +1,65 @@
+import math
+
+import numpy as np
+import pytest
+
+from app.upt_engine.numpy_lstm import NumpyLSTM
+
+
+def _sigmoid(v):
+    return 1.0 / (1.0 + math.exp(-v))
+
+
+def _reference_forward(sample, lstm_layers, dense_kernel, dense_bias):
+    """Công thức LSTM gốc, từng bước / từng unit (cổng i, f, c, o như Keras), float64"""
+    seq = [list(map(float, row)) for row in sample]
+    for kernel, recurrent, bias in lstm_layers:
+        units = recurrent.shape[0]
+        h, c = [0.0] * units, [0.0] * units
+        outputs = []
+        for x in seq:
+            z = [float(bias[k]) + sum(x[j] * float(kernel[j, k]) for j in range(len(x)))
+                 + sum(h[j] * float(recurrent[j, k]) for j in range(units)) for k in range(4 * units)]
+            c = [_sigmoid(z[units + u]) * c[u] + _sigmoid(z[u]) * math.tanh(z[2 * units + u]) for u in range(units)]
+            h = [_sigmoid(z[3 * units + u]) * math.tanh(c[u]) for u in range(units)]
+            outputs.append(h)
+        seq = outputs
+    return _sigmoid(sum(h[j] * float(dense_kernel[j, 0]) for j in range(len(h))) + float(dense_bias[0]))
+
+
+def _random_weights(rng, n_features, units):
+    layers = []
+    for n_in, n_units in zip([n_features] + units[:-1], units):
+        layers.append((rng.normal(0, 0.5, (n_in, 4 * n_units)),
+                       rng.normal(0, 0.5, (n_units, 4 * n_units)),
+                       rng.normal(0, 0.1, 4 * n_units)))
+    return layers, rng.normal(0, 0.5, (units[-1], 1)), rng.normal(0, 0.1, 1)
+
+
+@pytest.mark.parametrize("units", [[3], [4, 2], [5, 3, 2]])
+def test_matches_reference_forward(units):
+    rng = np.random.default_rng(len(units))
+    layers, dense_kernel, dense_bias = _random_weights(rng, 5, units)
+    x = rng.uniform(0, 1, (4, 6, 5))
+
+    got = NumpyLSTM(layers, dense_kernel, dense_bias).predict(x)
+    expected = [_reference_forward(sample, layers, dense_kernel, dense_bias) for sample in x]
+    assert got.shape == (4,)
+    np.testing.assert_allclose(got, expected, atol=1e-5)
+
+
+def test_single_sample_and_keras_call_shape():
+    rng = np.random.default_rng(1)
+    model = NumpyLSTM(*_random_weights(rng, 5, [3]))
+    x = rng.uniform(0, 1, (6, 5))
+    assert model.predict(x).shape == (1,)
+    assert model(x[None]).shape == (1, 1)
+
+
+def test_save_load_roundtrip(tmp_path):
+    rng = np.random.default_rng(2)
+    model = NumpyLSTM(*_random_weights(rng, 5, [4, 2]))
+    path = tmp_path / "weights.tmp"
+    model.save(path)
+    x = rng.uniform(0, 1, (3, 6, 5))
+    np.testing.assert_array_equal(NumpyLSTM.load(path).predict(x), model.predict(x))
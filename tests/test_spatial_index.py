@@ -0,0 +1,91 @@
+import numpy as np
+import pytest
+
+from app.models.spatial_index import EARTH_RADIUS_KM, SpatialIndex
+
+
+def _haversine(lat, lon, qlat, qlon):
+    lat, lon, qlat, qlon = map(np.radians, (lat, lon, qlat, qlon))
+    a = np.sin((lat - qlat) / 2) ** 2 + np.cos(lat) * np.cos(qlat) * np.sin((lon - qlon) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def _brute_bbox(lat, lon, min_lat, max_lat, min_lon, max_lon):
+    mask = (lat >= min_lat) & (lat <= max_lat)
+    if min_lon <= max_lon:
+        mask &= (lon >= min_lon) & (lon <= max_lon)
+    else:
+        mask &= (lon >= min_lon) | (lon <= max_lon)
+    return np.flatnonzero(mask)
+
+
+@pytest.fixture(scope="module")
+def events():
+    rng = np.random.default_rng(7)
+    lat = rng.uniform(-90, 90, 5000)
+    lon = rng.uniform(-180, 180, 5000)
+    # Cụm sát kinh tuyến 180 và 2 cực
+    lat[:200] = rng.uniform(-60, 60, 200)
+    lon[:200] = rng.choice([-1, 1], 200) * rng.uniform(175, 180, 200)
+    lat[200:250] = rng.uniform(85, 90, 50)
+    return lat, lon, SpatialIndex(lat, lon)
+
+
+def test_bbox_wrap_within_single_column():
+    index = SpatialIndex([0.0, 0.0, 0.0], [0.0, 100.0, -139.0])
+    # min_lon > max_lon nhưng cả 2 đầu cùng 1 ô 5° -> phải quét toàn bộ kinh độ trừ khe hở
+    assert index.bbox(-10, 10, -138, -139.5).tolist() == [0, 1]
+
+
+@pytest.mark.parametrize("box", [
+    (-30, 30, -20, 40),
+    (-90, 90, -180, 180),
+    (-45, 45, 170, -170),      # vắt qua kinh tuyến 180
+    (-60, 60, 179.5, -179.5),
+    (-10, 10, -138, -139.5),   # vắt qua, 2 đầu cùng 1 ô
+    (0, 90, 2.0, 1.0),
+    (80, 90, -180, 180),
+])
+def test_bbox_matches_brute_force(events, box):
+    lat, lon, index = events
+    assert index.bbox(*box).tolist() == _brute_bbox(lat, lon, *box).tolist()
+
+
+@pytest.mark.parametrize("query", [
+    (0.0, 0.0, 500.0),
+    (10.0, 179.0, 800.0),      # vòng tròn cắt kinh tuyến 180
+    (-20.0, -179.9, 300.0),
+    (88.0, 45.0, 600.0),       # chứa cực Bắc
+    (35.0, 139.0, 5000.0),
+])
+def test_radius_matches_brute_force(events, query):
+    lat, lon, index = events
+    qlat, qlon, radius_km = query
+    idx, dist = index.radius(qlat, qlon, radius_km)
+
+    expected = _haversine(lat, lon, qlat, qlon)
+    # Bỏ qua các điểm sát biên do sai số làm tròn giữa 2 công thức
+    inside = set(np.flatnonzero(expected <= radius_km - 1e-6))
+    edge = set(np.flatnonzero(np.abs(expected - radius_km) <= 1e-6))
+    assert inside <= set(idx.tolist()) <= inside | edge
+    np.testing.assert_allclose(dist, expected[idx], atol=1e-6)
+    assert np.all(np.diff(dist) >= 0)
+
+
+@pytest.mark.parametrize("query", [(0.0, 180.0, 10), (-45.0, -179.0, 25), (89.9, 0.0, 5), (12.0, 34.0, 10000)])
+def test_nearest_matches_brute_force(events, query):
+    lat, lon, index = events
+    qlat, qlon, k = query
+    idx, dist = index.nearest(qlat, qlon, k)
+
+    expected = np.sort(_haversine(lat, lon, qlat, qlon))[:k]
+    assert len(idx) == min(k, len(lat))
+    np.testing.assert_allclose(dist, expected, atol=1e-6)
+    np.testing.assert_allclose(_haversine(lat[idx], lon[idx], qlat, qlon), dist, atol=1e-6)
+
+
+def test_empty_index():
+    index = SpatialIndex([], [])
+    assert len(index.bbox(-90, 90, -180, 180)) == 0
+    assert len(index.radius(0, 0, 100)[0]) == 0
+    assert len(index.nearest(0, 0, 3)[0]) == 0
@@ -0,0 +1,90 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.upt_engine import telemetry_history
+from app.upt_engine.telemetry_history import HISTORY_FIELDS, TelemetryHistory
+
+
+def _reactor(v):
+    # Giá trị nguyên / nửa nguyên -> float32 biểu diễn chính xác
+    return SimpleNamespace(core_temp=v, neutron_flux=v * 2, k_eff=v / 2, r_plasma=-v,
+                           phase_noise=v + 0.5, geomagnetic_residual=100 - v)
+
+
+def _record_all(monkeypatch, capacity, samples):
+    clock = SimpleNamespace(now=0.0)
+    monkeypatch.setattr(telemetry_history, "time", SimpleNamespace(time=lambda: clock.now))
+    history = TelemetryHistory(capacity)
+    for t, v in samples:
+        clock.now = t
+        history.record(_reactor(v))
+    return history
+
+
+def _brute_query(samples, start, end, buckets):
+    """Bucket b chứa start + b*w <= t < start + (b+1)*w, bucket cuối gồm cả t == end"""
+    width = (end - start) / buckets
+    grouped = {}
+    for t, v in samples:
+        if start <= t <= end:
+            bucket = min(int((t - start) // width), buckets - 1) if width else 0
+            grouped.setdefault(bucket, []).append(_reactor(v))
+    keys = sorted(grouped)
+    expected = {"t": [start + k * width for k in keys], "count": [len(grouped[k]) for k in keys]}
+    attrs = ["core_temp", "neutron_flux", "k_eff", "r_plasma", "phase_noise", "geomagnetic_residual"]
+    for name, attr in zip(HISTORY_FIELDS, attrs):
+        columns = [[getattr(r, attr) for r in grouped[k]] for k in keys]
+        expected[name] = {"min": [min(c) for c in columns], "max": [max(c) for c in columns],
+                          "mean": [sum(c) / len(c) for c in columns]}
+    return expected
+
+
+def _assert_query(history, samples, start, end, buckets):
+    got = history.query(start, end, buckets)
+    expected = _brute_query(samples, start, end, buckets)
+    assert got["t"] == expected["t"]
+    assert got["count"] == expected["count"]
+    for name in HISTORY_FIELDS:
+        for stat in ("min", "max", "mean"):
+            np.testing.assert_allclose(got[name][stat], expected[name][stat], rtol=1e-6)
+
+
+@pytest.mark.parametrize("start,end,buckets", [
+    (100, 160, 6),   # toàn bộ dữ liệu còn giữ
+    (0, 1000, 10),   # khoảng rộng hơn dữ liệu
+    (120, 140, 4),   # 2 đầu nằm giữa dữ liệu
+    (131, 131, 1),   # start == end, trúng đúng 1 tick
+    (148, 170, 11),  # vắt qua điểm nối của ring buffer
+])
+def test_query_after_wraparound(monkeypatch, start, end, buckets):
+    samples = [(float(t), float(t % 13)) for t in range(100, 165)]
+    # Capacity 40 < 65 tick -> buffer đã vòng, chỉ còn 40 tick mới nhất
+    history = _record_all(monkeypatch, 40, samples)
+    assert len(history) == 40
+    _assert_query(history, samples[-40:], start, end, buckets)
+
+
+def test_query_before_buffer_fills(monkeypatch):
+    samples = [(float(t), float(t)) for t in range(10, 30)]
+    history = _record_all(monkeypatch, 50, samples)
+    assert len(history) == 20
+    _assert_query(history, samples, 12, 26, 7)
+
+
+def test_query_bounds_are_inclusive(monkeypatch):
+    samples = [(float(t), float(t)) for t in range(0, 20)]
+    history = _record_all(monkeypatch, 8, samples) # Còn giữ t = 12..19
+    result = history.query(12, 19, 1)
+    assert result["count"] == [8]
+    assert result["core_temp"]["min"] == [12.0] and result["core_temp"]["max"] == [19.0]
+
+
+def test_query_outside_window_is_empty(monkeypatch):
+    samples = [(float(t), 1.0) for t in range(0, 20)]
+    history = _record_all(monkeypatch, 8, samples)
+    for start, end in ((0, 11), (20, 30)): # Đã bị ghi đè / chưa tới
+        result = history.query(start, end, 5)
+        assert result["t"] == [] and result["count"] == []
+        assert result["k_eff"] == {"min": [], "max": [], "mean": []}